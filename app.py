@@ -1,20 +1,31 @@
 import os
-import asyncio
 import tempfile
 import time
 import json
-from flask import Flask, request, render_template, redirect, url_for, send_file, jsonify, session
-from werkzeug.utils import secure_filename
 import threading
+from flask import Flask, request, render_template, redirect, url_for, send_file, jsonify, session, Response
+from werkzeug.utils import secure_filename
 from datetime import datetime
 from flask import send_file
 
-import google.generativeai as genai
 from flask import request, jsonify
 from dotenv import load_dotenv
 
+# Before our modules: they read their settings from the environment when imported
+load_dotenv()
+
 # Import from our modules
-from tts import generate_simple_tts
+# (heavy SDKs - google.generativeai, edge_tts - are imported on first use, see gemini_client.py and backends.py)
+from tts import generate_simple_tts, is_progressive
+from output_profiles import DEFAULT_PROFILE, PROFILES, SAMPLE_RATES, resolve_profile
+from tts_cache import get_cache
+from job_queue import QueueFull, get_executor, shutdown_executor
+from job_store import get_job_store
+from janitor import get_janitor
+from gemini_client import get_script_client
+from resilience import get_fetcher
+from metrics import STAGES, get_metrics
+from captions import CAPTION_FORMATS, CAPTIONS_ENABLED
 
 # Import the downloader modules at the top of your app.py file
 import uuid
@@ -24,11 +35,6 @@ app = Flask(__name__)
 app.secret_key = "simple_tts_generator"  # for session management
 
 
-
-load_dotenv()
-
-def setup_gemini_api(api_key):
-    genai.configure(api_key=api_key)
 # Add this to your app initialization
 app.config['GEMINI_API_KEY'] = os.getenv("GEMINI_API_KEY")
 # Configure upload folder
@@ -36,15 +42,20 @@ UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload
 OUTPUT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
 ALLOWED_EXTENSIONS = {'txt'}
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Nothing here opens files, connections or threads: with gunicorn --preload this module is
+# imported once in the master, and each worker sets up its own state on first use (get_* helpers).
+# The upload and output folders are created by the routes that write to them.
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload size
-
-# Dictionary to store job statuses
-jobs = {}
+app.config['STREAM_IDLE_TIMEOUT'] = 60  # seconds without new audio before a live stream gives up
+app.config['EVENTS_MAX_DURATION'] = 300  # seconds before a status event stream closes (browsers reconnect)
+# Status event streams and live audio each hold a request thread for minutes. Beyond this many per
+# worker they get 503 (the status page falls back to polling), so uploads and downloads keep a thread.
+# Keep it below the worker's thread count (gunicorn.conf.py).
+app.config['MAX_STREAMS'] = int(os.getenv("TTS_MAX_STREAMS", "8"))
+stream_slots = threading.BoundedSemaphore(app.config['MAX_STREAMS'])
 
 # Define available voices with language grouping
 AVAILABLE_VOICES = [
@@ -94,30 +105,125 @@ def allowed_file(filename):
 def generate_unique_id():
     return f"{int(time.time())}_{os.urandom(4).hex()}"
 
-# Custom function to run async tasks in the background
-def run_async_task(coroutine, job_id):
-    async def wrapper():
-        try:
-            jobs[job_id]['status'] = 'processing'
-            result = await coroutine
-            jobs[job_id]['status'] = 'completed'
-            jobs[job_id]['result'] = result
-        except Exception as e:
-            jobs[job_id]['status'] = 'failed'
-            jobs[job_id]['error'] = str(e)
-            print(f"Error in job {job_id}: {str(e)}")
-    
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(wrapper())
-    loop.close()
+@app.before_request
+def start_janitor():
+    # Periodic cleanup of old job files, on a background thread (see janitor.py)
+    get_janitor([app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']], get_job_store())
+
+@app.before_request
+def start_metrics():
+    # Per-worker metrics, flushed to a shared directory for /metrics (see metrics.py)
+    get_metrics().add_collector(collect_metrics)
+
+@app.after_request
+def count_bytes_served(response):
+    # Progressive streams count their bytes as they are sent (see follow_audio_file)
+    if request.endpoint in ('download_file', 'stream_audio') and response.content_length and request.method == 'GET':
+        get_metrics().inc('tts_bytes_served_total', response.content_length, route=request.endpoint)
+    return response
+
+def session_owner():
+    # Stable id for this browser session, used to list its jobs
+    if 'sid' not in session:
+        session['sid'] = os.urandom(8).hex()
+    return session['sid']
+
+def request_profile():
+    # Output format chosen in the form (profile, optional channels / sample rate)
+    return resolve_profile(
+        request.form.get('output_profile') or None,
+        channels=request.form.get('channels') or None,
+        sample_rate=request.form.get('sample_rate') or None
+    )
+
+def output_form_options():
+    return {'output_profiles': PROFILES, 'default_profile': DEFAULT_PROFILE, 'sample_rates': SAMPLE_RATES}
+
+def collect_metrics():
+    # Gauges and totals sampled from this worker's executor, cache, backend calls and janitor
+    executor = get_executor()
+    cache = get_cache().stats()
+    synthesis = get_fetcher().stats()
+    samples = [
+        ('tts_queue_depth', {}, executor.queue_depth()),
+        ('tts_active_jobs', {}, executor.active),
+        ('tts_cache_requests_total', {'result': 'hit'}, cache['hits']),
+        ('tts_cache_requests_total', {'result': 'miss'}, cache['misses']),
+        ('tts_cache_bytes', {}, cache['bytes']),
+        ('tts_synthesis_attempts_total', {'outcome': 'failed'}, synthesis['failures']),
+        ('tts_synthesis_attempts_total', {'outcome': 'succeeded'}, synthesis['attempts'] - synthesis['failures']),
+        ('tts_synthesis_attempts_total', {'outcome': 'rejected'}, synthesis['rejected']),
+        ('tts_synthesis_hedges_total', {}, synthesis['hedges']),
+    ]
+    janitor = get_janitor().stats()
+    samples += [
+        ('tts_janitor_files_reclaimed_total', {'reason': 'expired'}, janitor['expired_files']),
+        ('tts_janitor_files_reclaimed_total', {'reason': 'quota'}, janitor['quota_files']),
+        ('tts_janitor_bytes_reclaimed_total', {}, janitor['bytes_reclaimed']),
+    ]
+    if janitor['last_run'] is not None:
+        samples.append(('tts_storage_bytes', {}, janitor['bytes']))
+    return samples
+
+def record_job_metrics(status, elapsed, timings, fragment_seconds):
+    metrics = get_metrics()
+    metrics.inc('tts_jobs_total', status=status)
+    metrics.observe('tts_job_seconds', elapsed)
+    # Synthesis is observed per fragment; the job-level total stays in the job record
+    for seconds in fragment_seconds:
+        metrics.observe('tts_stage_seconds', seconds, stage='synthesis')
+    for stage, seconds in timings.items():
+        if stage in STAGES and stage != 'synthesis':
+            metrics.observe('tts_stage_seconds', seconds, stage=stage)
+
+# Background job: runs on a persistent worker loop (see job_queue.py)
+async def run_tts_job(job_id, tts_args, tts_kwargs, queue_wait=0.0):
+    report = {}
+    started = time.time()
+
+    def progress(done, total):
+        get_job_store().update(job_id, progress={'done': done, 'total': total, 'percent': round(100 * done / total)})
+
+    def finish_timings(status):
+        # Seconds per stage (queue wait, synthesis, decode, speedup, depth, encode, write) for the job record
+        timings = {'queue_wait': queue_wait, **report.pop('timings', {})}
+        record_job_metrics(status, time.time() - started, timings, report.pop('fragment_seconds', []))
+        return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+    try:
+        get_job_store().update(job_id, status='processing', queue_wait=queue_wait)
+        result = await generate_simple_tts(*tts_args, report=report, progress=progress, captions=CAPTIONS_ENABLED,
+                                           **tts_kwargs)
+        timings = finish_timings('completed')
+        # Details filled in by generate_simple_tts (e.g. which pipeline ran, encode time)
+        get_job_store().update(job_id, status='completed', result=result, output_bytes=os.path.getsize(result),
+                         timings=timings, **report)
+    except Exception as e:
+        get_job_store().update(job_id, status='failed', error=str(e), timings=finish_timings('failed'))
+        print(f"Error in job {job_id}: {str(e)}")
+
+def submit_job(job_id, job, *tts_args, **tts_kwargs):
+    """
+    Record a TTS job and queue it. Returns None on success, or an error response if the queue is full.
+    """
+    get_job_store().create(job_id, job, owner=session_owner())
+    try:
+        position = get_executor().submit(run_tts_job, job_id, tts_args, tts_kwargs)
+    except QueueFull as e:
+        get_job_store().delete(job_id)
+        response = render_template('error.html', message=f"The server is busy: {e}. Please try again in a minute.")
+        return response, 429, {'Retry-After': '30'}
+
+    get_job_store().update(job_id, queue_position=position)
+    return None
 
 # Routes
 @app.route('/')
 def index():
     # Check if there's a prefill parameter
     prefill = request.args.get('prefill', '')
-    return render_template('index.html', voices=AVAILABLE_VOICES, languages=AVAILABLE_LANGUAGES, prefill=prefill)
+    return render_template('index.html', voices=AVAILABLE_VOICES, languages=AVAILABLE_LANGUAGES, prefill=prefill,
+                           **output_form_options())
 
 # Update the upload route to store the title
 @app.route('/upload', methods=['POST'])
@@ -129,6 +235,10 @@ def upload_file():
     voice_id = request.form.get('voice', 'en-US-JennyNeural')
     speed = float(request.form.get('speed', 1.0))
     depth = int(request.form.get('depth', 1))
+    try:
+        profile = request_profile()
+    except ValueError as e:
+        return render_template('error.html', message=str(e)), 400
     
     # Get title for the file if provided
     title = request.form.get('title', '')
@@ -177,17 +287,17 @@ def upload_file():
             title = os.path.splitext(script_filename)[0]
     
     # Generate safe filename from title if available
-    output_filename = f"tts_{job_id}.mp3"
+    output_filename = f"tts_{job_id}.{profile['extension']}"
     if title:
         # Create a safe filename from the title
         safe_title = secure_filename(title)
         if safe_title:
-            output_filename = f"{safe_title}_{job_id}.mp3"
+            output_filename = f"{safe_title}_{job_id}.{profile['extension']}"
     
     output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
     
     # Store title and other values in job info for reference
-    jobs[job_id] = {
+    job = {
         'status': 'pending',
         'script_file': script_path,
         'output_file': output_path,
@@ -197,38 +307,33 @@ def upload_file():
         'speed': speed,
         'depth': depth,
         'title': title,
-        'filename': output_filename
+        'filename': output_filename,
+        'output_profile': profile['name'],
+        'mimetype': profile['mimetype'],
+        # Output file grows while synthesizing and can be streamed early
+        'progressive': is_progressive(speed, depth, profile=profile)
     }
     
-    # Start the processing task in a background thread
-    process_task = generate_simple_tts(
-        script_path, output_path, voice_id, speed, depth
-    )
-    
-    thread = threading.Thread(
-        target=run_async_task,
-        args=(process_task, job_id)
-    )
-    thread.daemon = True
-    thread.start()
-    
-    # Store job ID in session
-    if 'jobs' not in session:
-        session['jobs'] = []
-    session['jobs'].append(job_id)
-    session.modified = True
+    # Queue the processing task on the background workers
+    error_response = submit_job(job_id, job, script_path, output_path, voice_id, speed, depth, profile=profile)
+    if error_response:
+        return error_response
     
     return redirect(url_for('job_status', job_id=job_id))
 
 @app.route('/ssml')
 def ssml_page():
-    return render_template('ssml.html', voices=AVAILABLE_VOICES)
+    return render_template('ssml.html', voices=AVAILABLE_VOICES, **output_form_options())
 
 @app.route('/upload-ssml', methods=['POST'])
 def upload_ssml():
     # Get form data
     ssml_content = request.form.get('ssml-content', '').strip()
     voice_id = request.form.get('voice', 'en-US-JennyNeural')
+    try:
+        profile = request_profile()
+    except ValueError as e:
+        return render_template('error.html', message=str(e)), 400
     
     if not ssml_content:
         return render_template('error.html', message="No SSML provided. Please enter SSML markup to convert to speech.")
@@ -252,80 +357,215 @@ def upload_ssml():
         f.write(ssml_content)
     
     # Output file setup
-    output_filename = f"tts_{job_id}.mp3"
+    output_filename = f"tts_{job_id}.{profile['extension']}"
     output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
     
     # Initialize job status
-    jobs[job_id] = {
+    job = {
         'status': 'pending',
         'script_file': script_path,
         'output_file': output_path,
         'start_time': time.time(),
         'input_type': 'ssml',
         'is_ssml': True,
-        'voice_id': voice_id
+        'voice_id': voice_id,
+        'filename': output_filename,
+        'output_profile': profile['name'],
+        'mimetype': profile['mimetype']
     }
     
-    # Start the processing task in a background thread
-    process_task = generate_simple_tts(
-        script_path, output_path, voice_id, 1.0, 1, True
-    )
-    
-    thread = threading.Thread(
-        target=run_async_task,
-        args=(process_task, job_id)
-    )
-    thread.daemon = True
-    thread.start()
-    
-    # Store job ID in session
-    if 'jobs' not in session:
-        session['jobs'] = []
-    session['jobs'].append(job_id)
-    session.modified = True
+    # Queue the processing task on the background workers
+    error_response = submit_job(job_id, job, script_path, output_path, voice_id, 1.0, 1, True, profile=profile)
+    if error_response:
+        return error_response
     
     return redirect(url_for('job_status', job_id=job_id))
 
 @app.route('/status/<job_id>')
 def job_status(job_id):
-    if job_id not in jobs:
+    job = get_job_store().get(job_id)
+    if job is None:
         return render_template('error.html', message="Job not found.")
     
-    job = jobs[job_id]
     # Pass the AVAILABLE_VOICES list to the template
     return render_template('status.html', job_id=job_id, job=job, voices=AVAILABLE_VOICES)
 
 @app.route('/api/status/<job_id>')
 def api_job_status(job_id):
-    if job_id not in jobs:
+    job = get_job_store().get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id].copy()
     # Calculate elapsed time
     elapsed = time.time() - job['start_time']
     job['elapsed_time'] = elapsed
     
     return jsonify(job)
 
+def status_payload(job):
+    # Fields the status page needs; sent on every change
+    payload = {
+        'status': job['status'],
+        'error': job.get('error'),
+        'progress': job.get('progress'),
+        'elapsed_time': time.time() - job['start_time']
+    }
+    if job['status'] == 'completed':
+        # What the download section shows, for pages that watched the job finish
+        payload['captions'] = [fmt for fmt in CAPTION_FORMATS if fmt in (job.get('captions') or {})]
+        payload['output_profile'] = job.get('output_profile')
+        payload['output_bytes'] = job.get('output_bytes')
+        payload['encode_seconds'] = job.get('encode_seconds')
+    return payload
+
+def stream_response(body, **kwargs):
+    """
+    Response for a long-lived stream, holding one of this worker's stream slots until it closes.
+
+    Returns 503 with Retry-After when all slots are taken.
+    """
+    if not stream_slots.acquire(blocking=False):
+        get_metrics().inc('tts_streams_rejected_total', route=request.endpoint)
+        return jsonify({'error': 'Too many open streams, please try again shortly'}), 503, {'Retry-After': '5'}
+    response = Response(body, **kwargs)
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route('/api/status/<job_id>/events')
+def api_job_events(job_id):
+    """
+    Server-Sent Events stream of status changes for one job.
+
+    The job record is only re-read when its update timestamp changes, and
+    the stream ends once the job has completed or failed.
+    """
+    if get_job_store().updated_at(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        last_seen = None
+        last_sent = time.time()
+        deadline = time.time() + app.config['EVENTS_MAX_DURATION']
+        yield "retry: 2000\n\n"
+        while time.time() < deadline:
+            updated = get_job_store().updated_at(job_id)
+            if updated is None:
+                return
+            if updated != last_seen:
+                last_seen = updated
+                job = get_job_store().get(job_id)
+                yield f"event: status\ndata: {json.dumps(status_payload(job))}\n\n"
+                last_sent = time.time()
+                if job['status'] in ('completed', 'failed'):
+                    return
+            elif time.time() - last_sent > 15:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+            time.sleep(0.25)
+
+    return stream_response(events(), mimetype='text/event-stream',
+                           headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    # Hit/miss counters of the synthesis cache in this worker
+    return jsonify(get_cache().stats())
+
+@app.route('/api/storage-stats')
+def api_storage_stats():
+    # Files/bytes kept and reclaimed by the janitor in this worker
+    return jsonify(get_janitor().stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Prometheus text format, summed over all worker processes
+    return Response(get_metrics().render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/synthesis-stats')
+def api_synthesis_stats():
+    # Retries, timeouts, hedges and circuit breaker state of edge-tts calls in this worker
+    return jsonify(get_fetcher().stats())
+
 @app.route('/download/<job_id>')
 def download_file(job_id):
-    if job_id not in jobs or jobs[job_id]['status'] != 'completed':
+    job = get_job_store().get(job_id)
+    if job is None or job['status'] != 'completed':
         return render_template('error.html', message="File not available for download.")
     
-    output_file = jobs[job_id]['result']
+    output_file = job['result']
+    if not os.path.exists(output_file):
+        return render_template('error.html', message="This file has expired and was removed from the server."), 410
     # Get the custom filename from the job info
-    filename = jobs[job_id].get('filename', f"voiceover_{job_id}.mp3")
-    
-    return send_file(output_file, as_attachment=True, download_name=filename)
+    filename = job.get('filename', f"voiceover_{job_id}.mp3")
+    
+    return send_file(output_file, as_attachment=True, download_name=filename,
+                     mimetype=job.get('mimetype', 'audio/mpeg'))
+
+@app.route('/download/<job_id>/captions.<fmt>')
+def download_captions(job_id, fmt):
+    # SRT / WebVTT written next to the audio from the synthesis word timings (see captions.py)
+    job = get_job_store().get(job_id)
+    if job is None or job['status'] != 'completed' or fmt not in CAPTION_FORMATS:
+        return render_template('error.html', message="Captions not available for download."), 404
+
+    captions_file = job.get('captions', {}).get(fmt)
+    if not captions_file:
+        return render_template('error.html', message="No captions were generated for this job."), 404
+    if not os.path.exists(captions_file):
+        return render_template('error.html', message="This file has expired and was removed from the server."), 410
+
+    filename = os.path.splitext(job.get('filename', f"voiceover_{job_id}.mp3"))[0]
+    return send_file(captions_file, as_attachment=True, download_name=f"{filename}.{fmt}",
+                     mimetype=CAPTION_FORMATS[fmt])
+
+def job_finished(job_id):
+    job = get_job_store().get(job_id)
+    return job is None or job['status'] in ('completed', 'failed')
+
+def follow_audio_file(job_id, audio_file, block_size=16 * 1024):
+    """
+    Yield the bytes of a job's output file while it is still being written.
+
+    Stops once the job has finished and everything has been sent, or after
+    STREAM_IDLE_TIMEOUT seconds without new data.
+    """
+    idle_since = time.time()
+    while not os.path.exists(audio_file):
+        if job_finished(job_id) or time.time() - idle_since > app.config['STREAM_IDLE_TIMEOUT']:
+            return
+        time.sleep(0.1)
+
+    with open(audio_file, 'rb') as f:
+        while True:
+            finished = job_finished(job_id)
+            data = f.read(block_size)
+            if data:
+                idle_since = time.time()
+                get_metrics().inc('tts_bytes_served_total', len(data), route='stream_audio')
+                yield data
+            elif finished or time.time() - idle_since > app.config['STREAM_IDLE_TIMEOUT']:
+                return
+            else:
+                time.sleep(0.1)
 
 @app.route('/stream-audio/<job_id>')
 def stream_audio(job_id):
-    # Get the job data from your jobs dictionary
-    job = jobs.get(job_id)
+    # Get the job data from the job store
+    job = get_job_store().get(job_id)
     
     if not job:
         return "Job not found", 404
     
+    # Jobs without post-processing write their output progressively:
+    # serve it as a chunked response while synthesis is still running
+    if job['status'] in ('pending', 'processing') and job.get('progressive'):
+        return stream_response(
+            follow_audio_file(job_id, job['output_file']),
+            mimetype='audio/mpeg',
+            headers={'Cache-Control': 'no-cache'}
+        )
+    
     # Check if job is completed
     if job['status'] != 'completed':
         return "Audio not ready for streaming", 404
@@ -337,22 +577,20 @@ def stream_audio(job_id):
         audio_file = job['result']
     else:
         audio_file = job['output_file']
+    if not os.path.exists(audio_file):
+        return "Audio file has expired", 410
     
     # Return the file as a streaming response
     return send_file(
         audio_file, 
-        mimetype='audio/mpeg',
+        mimetype=job.get('mimetype', 'audio/mpeg'),
         as_attachment=False,
         conditional=True
     )
 @app.route('/dashboard')
 def dashboard():
-    user_jobs = session.get('jobs', [])
-    user_job_data = {}
-    
-    for job_id in user_jobs:
-        if job_id in jobs:
-            user_job_data[job_id] = jobs[job_id]
+    # Newest first, from the shared job store
+    user_job_data = get_job_store().list_jobs(owner=session_owner())
     
     # Pass the AVAILABLE_VOICES list to the template
     return render_template('dashboard.html', jobs=user_job_data, voices=AVAILABLE_VOICES)
@@ -377,6 +615,50 @@ def shorts_generator():
     """Route for the AI shorts script generator page"""
     return render_template('shorts_generator.html', voices=AVAILABLE_VOICES, languages=AVAILABLE_LANGUAGES)
 
+def wants_stream():
+    """True if the client asked for the script as server-sent events"""
+    if request.values.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+def script_response(prompt, label):
+    """
+    Generate a script with Gemini and return it to the client.
+
+    JSON clients get {'success': True, 'script': ...} once the script is
+    complete. Streaming clients (stream=1 or Accept: text/event-stream) get
+    'chunk' events with the text as it is generated, then a 'done' event
+    with the full script, or an 'error' event.
+    """
+    client = get_script_client(app.config['GEMINI_API_KEY'])
+
+    if not wants_stream():
+        try:
+            return jsonify({
+                'success': True,
+                'script': client.generate(prompt)
+            })
+        except Exception as e:
+            print(f"Error generating {label}: {e}")
+            return jsonify({'error': 'Failed to generate script. Please try again later.'}), 500
+
+    def events():
+        cached = client.is_cached(prompt)
+        parts = []
+        try:
+            for text in client.stream(prompt):
+                parts.append(text)
+                yield f"event: chunk\ndata: {json.dumps({'text': text})}\n\n"
+        except Exception as e:
+            print(f"Error generating {label}: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to generate script. Please try again later.'})}\n\n"
+            return
+        done = {'script': ''.join(parts), 'cached': cached}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/generate-shorts-script', methods=['POST'])
 def generate_shorts_script():
     # Get data from request
@@ -427,26 +709,7 @@ It should feel cinematic, reflective, and easy to understand — like wisdom tol
 
 """
     
-    try:
-        # Configure the Gemini API with your key
-        setup_gemini_api(app.config['GEMINI_API_KEY'])
-           
-        # Generate content with Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
-       
-        # Extract the generated text
-        script_text = response.text
-       
-        # Return the generated script
-        return jsonify({
-            'success': True,
-            'script': script_text
-        })
-    
-    except Exception as e:
-        print(f"Error generating shorts script: {e}")
-        return jsonify({'error': 'Failed to generate script. Please try again later.'}), 500
+    return script_response(prompt, 'shorts script')
 
 @app.route('/generate-script', methods=['POST'])
 def generate_script():
@@ -501,27 +764,7 @@ Return ONLY the clean, ready-to-record script with no additional text or formatt
 """
 
     
-    try:
-        # Configure the Gemini API with your key
-        # No need to check if API key is set - just configure it each time
-        setup_gemini_api(app.config['GEMINI_API_KEY'])
-           
-        # Generate content with Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
-       
-        # Extract the generated text
-        script_text = response.text
-       
-        # Return the generated script
-        return jsonify({
-            'success': True,
-            'script': script_text
-        })
-    
-    except Exception as e:
-        print(f"Error generating script: {e}")
-        return jsonify({'error': 'Failed to generate script. Please try again later.'}), 500
+    return script_response(prompt, 'script')
 
 @app.route('/script-generator')
 def script_generator():
@@ -634,30 +877,15 @@ Guidelines:
 The script should feel persuasive and compelling, with a clear focus on how {product_name} helps {target_audience} achieve {main_benefit}.
 """
     
-    try:
-        # Configure the Gemini API with your key
-        setup_gemini_api(app.config['GEMINI_API_KEY'])
-           
-        # Generate content with Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
-       
-        # Extract the generated text
-        script_text = response.text
-       
-        # Return the generated script
-        return jsonify({
-            'success': True,
-            'script': script_text
-        })
-    
-    except Exception as e:
-        print(f"Error generating marketing script: {e}")
-        return jsonify({'error': 'Failed to generate script. Please try again later.'}), 500
+    return script_response(prompt, 'marketing script')
     
 
 
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    try:
+        app.run(debug=True)
+    finally:
+        # Finish queued jobs before the CPU pool goes away (see job_queue.shutdown_executor)
+        shutdown_executor()
\ No newline at end of file
@@ -0,0 +1,49 @@
+def normalize_segments(segments, frame_rate=None, channels=None, sample_width=None):
+    """
+    Convert segments to one common PCM format.
+
+    Unless given explicitly, the highest frame rate, channel count and sample
+    width among the segments is used (the same rule pydub applies when adding
+    two segments). Segments already in the target format are not copied.
+
+    Returns:
+        list: AudioSegments sharing frame_rate, channels and sample_width
+    """
+    frame_rate = frame_rate or max(s.frame_rate for s in segments)
+    channels = channels or max(s.channels for s in segments)
+    sample_width = sample_width or max(s.sample_width for s in segments)
+
+    normalized = []
+    for seg in segments:
+        if seg.frame_rate != frame_rate:
+            seg = seg.set_frame_rate(frame_rate)
+        if seg.channels != channels:
+            seg = seg.set_channels(channels)
+        if seg.sample_width != sample_width:
+            seg = seg.set_sample_width(sample_width)
+        normalized.append(seg)
+    return normalized
+
+
+def concatenate_segments(segments, frame_rate=None, channels=None, sample_width=None):
+    """
+    Join AudioSegments in one pass.
+
+    Summing segments with `+` copies everything assembled so far on every
+    addition, which is quadratic in the number of fragments. Here each
+    fragment's PCM is copied exactly once into the output buffer, so joining
+    N fragments costs O(total samples).
+
+    Args:
+        segments (list): AudioSegments in playback order (None/empty ones are skipped)
+        frame_rate, channels, sample_width: Optional target format
+
+    Returns:
+        AudioSegment or None if there is nothing to join
+    """
+    segments = [s for s in segments if s is not None and len(s) > 0]
+    if not segments:
+        return None
+
+    segments = normalize_segments(segments, frame_rate, channels, sample_width)
+    return segments[0]._spawn(b"".join(s.raw_data for s in segments))
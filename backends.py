@@ -0,0 +1,155 @@
+import os
+import random
+import asyncio
+import threading
+
+# Synthesis backend: "edge" (Microsoft edge-tts service) or "fake" (offline stand-in)
+BACKEND = os.getenv("TTS_BACKEND", "edge")
+
+# Fake backend behaviour (override with environment variables)
+FAKE_LATENCY = float(os.getenv("TTS_FAKE_LATENCY", "0.3"))       # seconds before the first audio
+FAKE_JITTER = float(os.getenv("TTS_FAKE_JITTER", "0.1"))         # +/- random spread of the latency
+FAKE_FAILURE_RATE = float(os.getenv("TTS_FAKE_FAILURE_RATE", "0"))  # share of calls that fail
+FAKE_REALTIME = float(os.getenv("TTS_FAKE_REALTIME", "20"))      # audio seconds delivered per second
+FAKE_CHARS_PER_SECOND = float(os.getenv("TTS_FAKE_CHARS_PER_SECOND", "15"))  # speaking rate at +0%
+FAKE_SEED = os.getenv("TTS_FAKE_SEED")
+
+
+class SynthesisBackend:
+    """
+    A text-to-speech service.
+
+    stream() yields encoded audio in the format described by
+    output_profiles.SOURCE_FORMAT (24 kHz mono MP3), in chunks, as it
+    arrives. With boundaries=True it also yields a dict per spoken word,
+    {"start", "end", "text"} with times in seconds from the start of the
+    audio, in between the audio chunks. Errors are raised from the
+    generator; retries, deadlines and hedging are handled by the caller
+    (see resilience.py).
+    """
+
+    name = None
+
+    async def stream(self, text, voice_id, rate="+0%", boundaries=False):
+        raise NotImplementedError
+        yield
+
+
+class EdgeBackend(SynthesisBackend):
+    """The Microsoft Edge read-aloud service, through edge-tts"""
+
+    name = "edge"
+
+    async def stream(self, text, voice_id, rate="+0%", boundaries=False):
+        from edge_tts import Communicate
+        communicate = Communicate(text.strip(), voice_id, rate=rate,
+                                  boundary="WordBoundary" if boundaries else "SentenceBoundary")
+
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+            elif boundaries and chunk["type"] == "WordBoundary":
+                # Offsets and durations are in 100 ns ticks
+                start = chunk["offset"] / 1e7
+                yield {"start": start, "end": start + chunk["duration"] / 1e7, "text": chunk["text"]}
+
+
+class FakeBackend(SynthesisBackend):
+    """
+    Offline stand-in for load tests and benchmarks.
+
+    Produces silent MPEG-2 Layer III frames (24 kHz mono, 48 kbit/s, the
+    same format as edge-tts), so everything downstream (decoding, effects,
+    encoding, caching, streaming) runs for real. The audio length depends
+    only on the text and rate, and is therefore deterministic; word
+    boundaries split it in proportion to the length of each word. The first
+    chunk arrives after latency +/- jitter seconds; the rest is paced at
+    `realtime` times playback speed. A share of calls (failure_rate) raise
+    ConnectionError, before or during the stream.
+    """
+
+    name = "fake"
+
+    # MPEG-2 Layer III, 48 kbit/s, 24 kHz, mono, no CRC; zeroed side info decodes to silence
+    FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+    FRAME_SECONDS = 576 / 24000
+    FRAMES_PER_CHUNK = 40  # about 1 s of audio per chunk
+
+    def __init__(self, latency=FAKE_LATENCY, jitter=FAKE_JITTER, failure_rate=FAKE_FAILURE_RATE,
+                 realtime=FAKE_REALTIME, chars_per_second=FAKE_CHARS_PER_SECOND, seed=FAKE_SEED):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.realtime = realtime
+        self.chars_per_second = chars_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def duration(self, text, rate="+0%"):
+        """Seconds of audio produced for text at an edge-tts rate such as "+25%" """
+        speed = 1.0 + int(rate.rstrip("%")) / 100
+        return max(0.5, len(text.strip()) / self.chars_per_second / max(speed, 0.1))
+
+    def words(self, text, rate="+0%"):
+        """Word timings for text, spread over its duration by word length"""
+        tokens = text.split()
+        seconds_per_char = self.duration(text, rate) / max(1, sum(len(t) + 1 for t in tokens))
+        words = []
+        start = 0.0
+        for token in tokens:
+            end = start + len(token) * seconds_per_char
+            words.append({"start": start, "end": end, "text": token})
+            start = end + seconds_per_char
+        return words
+
+    def _draw(self):
+        with self._lock:
+            return self._random.uniform(-1, 1), self._random.random(), self._random.random()
+
+    async def stream(self, text, voice_id, rate="+0%", boundaries=False):
+        spread, fail, fail_at = self._draw()
+        frames = round(self.duration(text, rate) / self.FRAME_SECONDS)
+        words = self.words(text, rate) if boundaries else []
+        await asyncio.sleep(max(0.0, self.latency + spread * self.jitter))
+
+        failing = fail < self.failure_rate
+        if failing and fail_at < 0.5:
+            raise ConnectionError("Fake backend: connection refused")
+
+        # A drawn failure always fires: at the chunk holding this frame, at the latest the last one
+        fail_frame = min(frames - 1, int(frames * fail_at))
+        sent = 0
+        while sent < frames:
+            count = min(self.FRAMES_PER_CHUNK, frames - sent)
+            if failing and sent + count > fail_frame:
+                raise ConnectionError("Fake backend: connection reset")
+            if sent and self.realtime > 0:
+                await asyncio.sleep(count * self.FRAME_SECONDS / self.realtime)
+            # Words that start in this chunk come just before its audio, as with edge-tts
+            while words and words[0]["start"] < (sent + count) * self.FRAME_SECONDS:
+                yield words.pop(0)
+            yield self.FRAME * count
+            sent += count
+
+
+BACKENDS = {"edge": EdgeBackend, "fake": FakeBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def use_backend(name):
+    """Select the synthesis backend for this process by name"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown synthesis backend: {name} (choose from {', '.join(sorted(BACKENDS))})")
+    with _backend_lock:
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+def get_backend():
+    """Return this process's synthesis backend (TTS_BACKEND unless use_backend() picked another)"""
+    with _backend_lock:
+        backend = _backend
+    return backend or use_backend(BACKEND)
@@ -0,0 +1,73 @@
+"""
+Benchmark the NumPy depth effect (dsp.py) against the original pydub chain.
+
+Usage:
+    python benchmarks/bench_depth.py [--seconds 60] [--depth 3] [--frame-rate 24000]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from pydub import AudioSegment
+from pydub.effects import low_pass_filter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dsp import depth_effect, segment_to_array  # noqa: E402
+
+
+def pydub_depth(audio, depth):
+    """The depth chain as tts.py ran it before dsp.py"""
+    cutoff = 18000 - (depth * 3000)
+    audio = low_pass_filter(audio, cutoff)
+    bass_boost_db = (depth - 1) * 3
+    if bass_boost_db > 0:
+        bass = audio.low_pass_filter(300) + bass_boost_db
+        audio = audio.overlay(bass)
+    fade = min(200, len(audio) // 20)
+    return audio.fade_in(fade).fade_out(fade)
+
+
+def make_signal(seconds, frame_rate, channels):
+    """Speech-like test signal: a few harmonics with a slow envelope and some noise"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 560, 1120, 3300)))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    signal = 6000 * voice * envelope + 500 * rng.standard_normal(len(t))
+    samples = np.repeat(signal[:, None], channels, axis=1).astype(np.int16)
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--frame-rate", type=int, default=24000)
+    parser.add_argument("--channels", type=int, default=1)
+    args = parser.parse_args()
+
+    audio = make_signal(args.seconds, args.frame_rate, args.channels)
+    print(f"Input: {args.seconds:.0f}s, {args.frame_rate}Hz, {args.channels}ch, depth {args.depth}")
+
+    reference, pydub_time = timed(pydub_depth, audio, args.depth)
+    result, numpy_time = timed(depth_effect, audio, args.depth)
+
+    expected = segment_to_array(reference).astype(np.float64)
+    actual = segment_to_array(result).astype(np.float64)
+    diff = actual - expected
+    rms = np.sqrt(np.mean(expected ** 2))
+    print(f"pydub: {pydub_time:.3f}s")
+    print(f"numpy: {numpy_time:.3f}s ({pydub_time / numpy_time:.1f}x faster)")
+    print(f"max abs diff: {np.abs(diff).max():.0f} LSB, "
+          f"rms diff: {np.sqrt(np.mean(diff ** 2)):.2f} LSB ({20 * np.log10(rms / max(np.sqrt(np.mean(diff ** 2)), 1e-9)):.1f} dB below signal)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark the WSOLA time-stretch (dsp.py) against pydub.effects.speedup.
+
+Usage:
+    python benchmarks/bench_stretch.py [--seconds 60] [--rate 1.15] [--frame-rate 24000]
+"""
+import os
+import sys
+import argparse
+from pydub.effects import speedup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dsp import stretch_segment  # noqa: E402
+from bench_depth import make_signal, timed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--rate", type=float, default=1.15)
+    parser.add_argument("--frame-rate", type=int, default=24000)
+    parser.add_argument("--channels", type=int, default=1)
+    args = parser.parse_args()
+
+    audio = make_signal(args.seconds, args.frame_rate, args.channels)
+    print(f"Input: {args.seconds:.0f}s, {args.frame_rate}Hz, {args.channels}ch, rate {args.rate}")
+
+    # pydub's speedup can only speed up
+    if args.rate > 1:
+        reference, pydub_time = timed(speedup, audio, args.rate)
+        print(f"pydub speedup: {pydub_time:.3f}s ({args.seconds / pydub_time:.0f}x real time), "
+              f"{len(reference) / 1000:.2f}s out")
+
+    result, wsola_time = timed(stretch_segment, audio, args.rate)
+    print(f"wsola: {wsola_time:.3f}s ({args.seconds / wsola_time:.0f}x real time), "
+          f"{len(result) / 1000:.2f}s out (expected {args.seconds / args.rate:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
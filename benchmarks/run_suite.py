@@ -0,0 +1,266 @@
+"""
+Run the audio pipeline microbenchmarks offline and save the results as JSON.
+
+Synthesis uses the fake backend (backends.py) with no latency, so only
+local work is measured: SSML parsing, fragment assembly, speedup, the depth
+filter chain, MP3 encoding and generate_simple_tts end to end. The startup
+cases time a fresh interpreter importing app.py and serving its first
+request, and a worker forked from a preloaded app (gunicorn --preload)
+serving its first request.
+
+Usage:
+    python benchmarks/run_suite.py [--quick] [--repeat 3] [--only depth,startup]
+                                   [--output results.json] [--compare baseline.json]
+
+Results go to benchmarks/results/<commit>.json unless --output is given.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+# Offline, in-process and uncached: set before the pipeline modules read them
+os.environ.update({
+    "TTS_BACKEND": "fake",
+    "TTS_FAKE_LATENCY": "0",
+    "TTS_FAKE_JITTER": "0",
+    "TTS_FAKE_REALTIME": "0",
+    "TTS_FAKE_FAILURE_RATE": "0",
+    "TTS_CACHE_ENABLED": "0",
+    "TTS_CPU_WORKERS": "0",
+    "TTS_HEDGE": "0",
+})
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import numpy as np  # noqa: E402
+from pydub import AudioSegment  # noqa: E402
+from audio_assembly import concatenate_segments  # noqa: E402
+from dsp import depth_effect, stretch_segment  # noqa: E402
+from output_profiles import export_segment, resolve_profile  # noqa: E402
+from ssml_parser import _chunks, iter_fragments, parse_ssml_to_audio, plan_requests  # noqa: E402
+from tts import generate_simple_tts  # noqa: E402
+from bench_depth import make_signal  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+WORK_DIR = os.path.join(RESULTS_DIR, "tmp")
+
+FRAGMENT_COUNTS = (10, 100, 1000)
+DURATIONS = (10, 60, 300)
+QUICK_FRAGMENT_COUNTS = (10, 100)
+QUICK_DURATIONS = (10, 60)
+
+
+def make_ssml(fragments):
+    """An SSML document with `fragments` children: sentences, breaks and prosody"""
+    parts = []
+    for i in range(fragments):
+        if i % 3 == 1:
+            parts.append(f'<break time="{100 + i % 5 * 50}ms"/>')
+        elif i % 3 == 2:
+            rate = ("slow", "fast", "+20%")[i // 3 % 3]
+            parts.append(f'<prosody rate="{rate}">Sentence number {i} is here.</prosody>')
+        else:
+            parts.append(f"<p>Sentence number {i} is a plain one.</p>")
+    return f'<speak xmlns="http://www.w3.org/2001/10/synthesis">{"".join(parts)}</speak>'
+
+
+def bench_ssml_parse(counts, durations):
+    # The path parse_ssml_to_audio runs before any synthesis: incremental parse + request planning
+    for count in counts:
+        ssml = make_ssml(count)
+        yield "ssml_parse", {"fragments": count}, lambda s=ssml: list(plan_requests(iter_fragments(_chunks(s))))
+
+
+def bench_assembly(counts, durations):
+    for count in counts:
+        # Fragments of about 2 s, like short sentences
+        segments = [AudioSegment.silent(duration=1500 + i % 7 * 100, frame_rate=24000) for i in range(count)]
+        yield "fragment_assembly", {"fragments": count}, lambda s=segments: concatenate_segments(s)
+
+
+def bench_ssml_render(counts, durations):
+    for count in counts:
+        ssml = make_ssml(count)
+        yield "ssml_render", {"fragments": count}, lambda s=ssml: asyncio.run(parse_ssml_to_audio(s, "en-US-GuyNeural"))
+
+
+def bench_speedup(counts, durations):
+    for seconds in durations:
+        audio = make_signal(seconds, 24000, 1)
+        yield "speedup", {"seconds": seconds, "rate": 1.15}, lambda a=audio: stretch_segment(a, 1.15)
+
+
+def bench_depth(counts, durations):
+    for seconds in durations:
+        audio = make_signal(seconds, 24000, 1)
+        yield "depth", {"seconds": seconds, "depth": 3}, lambda a=audio: depth_effect(a, 3)
+
+
+def bench_encode(counts, durations):
+    for name in ("mp3", "mp3-speech"):
+        profile = resolve_profile(name)
+        for seconds in durations:
+            audio = make_signal(seconds, 24000, 1)
+            path = os.path.join(WORK_DIR, f"encode.{profile['extension']}")
+            yield "encode", {"seconds": seconds, "profile": name}, \
+                lambda a=audio, p=path, pr=profile: export_segment(a, p, pr)
+
+
+def bench_generate(counts, durations):
+    for seconds in durations:
+        # The fake backend speaks 15 characters per second
+        script = os.path.join(WORK_DIR, f"script_{seconds}.txt")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write("This is a benchmark sentence for the pipeline. " * int(seconds * 15 / 47 + 1))
+        for pipeline, speed, depth in (("passthrough", 1.0, 1), ("transcode", 1.3, 3)):
+            yield "generate_simple_tts", {"seconds": seconds, "pipeline": pipeline}, \
+                lambda s=script, sp=speed, d=depth: generate(s, sp, d)
+
+
+def generate(script, speed, depth):
+    output = os.path.join(WORK_DIR, "generate.mp3")
+    result = asyncio.run(generate_simple_tts(script, output, "en-US-GuyNeural", speed, depth))
+    os.remove(result)
+
+
+# Run in a fresh interpreter for each timed run
+STARTUP_SCRIPTS = {
+    "interpreter": "pass",
+    "import": "import app",
+    "first_request": "import app; assert app.app.test_client().get('/').status_code == 200",
+}
+
+
+def bench_startup(counts, durations):
+    env = dict(os.environ, PYTHONPATH=ROOT, JOB_STORE="memory", TTS_JANITOR="0",
+               TTS_METRICS_DIR=os.path.join(WORK_DIR, "metrics"))
+    for stage, script in STARTUP_SCRIPTS.items():
+        yield "startup", {"stage": stage}, \
+            lambda s=script: subprocess.run([sys.executable, "-c", s], env=env, check=True)
+
+    # gunicorn --preload: the master imports the app once, each worker is a fork of it
+    os.environ.update(JOB_STORE="memory", TTS_JANITOR="0", TTS_METRICS_DIR=env["TTS_METRICS_DIR"])
+    import app
+    yield "startup", {"stage": "preloaded_worker"}, lambda: forked_request(app.app)
+
+
+def forked_request(flask_app):
+    pid = os.fork()
+    if pid == 0:
+        ok = flask_app.test_client().get("/").status_code == 200
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        raise RuntimeError("First request in the forked worker failed")
+
+
+BENCHMARKS = {
+    "ssml_parse": bench_ssml_parse,
+    "assembly": bench_assembly,
+    "ssml_render": bench_ssml_render,
+    "speedup": bench_speedup,
+    "depth": bench_depth,
+    "encode": bench_encode,
+    "generate": bench_generate,
+    "startup": bench_startup,
+}
+
+
+def measure(func, repeat):
+    func()  # warm-up (imports, ffmpeg start-up, caches)
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def result_key(result):
+    return result["name"] + " " + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        change = result["median"] / old["median"] - 1
+        print(f"  {result_key(result):<60} {old['median']:.4f}s -> {result['median']:.4f}s ({change:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Skip the largest sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (after one warm-up)")
+    parser.add_argument("--only", type=str, help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", type=str, help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=str, help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    counts = QUICK_FRAGMENT_COUNTS if args.quick else FRAGMENT_COUNTS
+    durations = QUICK_DURATIONS if args.quick else DURATIONS
+    os.makedirs(WORK_DIR, exist_ok=True)
+
+    results = []
+    for name in names:
+        for case, params, func in BENCHMARKS[name](counts, durations):
+            runs = measure(func, args.repeat)
+            result = {
+                "name": case,
+                "params": params,
+                "runs": [round(r, 6) for r in runs],
+                "min": round(min(runs), 6),
+                "median": round(statistics.median(runs), 6),
+            }
+            if "seconds" in params:
+                result["realtime_factor"] = round(params["seconds"] / result["median"], 1)
+            results.append(result)
+            extra = f", {result['realtime_factor']}x real time" if "realtime_factor" in result else ""
+            print(f"{result_key(result):<60} median {result['median']:.4f}s{extra}")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "quick": args.quick,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
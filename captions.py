@@ -0,0 +1,110 @@
+import os
+
+# Caption settings (override with environment variables)
+# Word timings come from the synthesis backend (edge-tts WordBoundary events), so captions cost no extra pass
+CAPTIONS_ENABLED = os.getenv("TTS_CAPTIONS", "1") != "0"
+CAPTION_MAX_CHARS = int(os.getenv("TTS_CAPTION_MAX_CHARS", "42"))        # per cue (one line)
+CAPTION_MAX_SECONDS = float(os.getenv("TTS_CAPTION_MAX_SECONDS", "5"))   # longest cue on screen
+CAPTION_MAX_GAP = float(os.getenv("TTS_CAPTION_MAX_GAP", "0.6"))         # a longer pause starts a new cue
+
+CAPTION_FORMATS = {"srt": "application/x-subrip", "vtt": "text/vtt"}
+
+
+def shift_words(words, offset=0.0, factor=1.0):
+    """
+    Map word timings onto a later timeline.
+
+    Args:
+        words (list): {"start", "end", "text"} dicts, times in seconds
+        offset (float): Seconds to add (position of the audio in the output)
+        factor (float): Tempo change applied to the audio after synthesis
+            (times are divided by it)
+
+    Returns:
+        list: New word dicts
+    """
+    return [
+        {"start": offset + word["start"] / factor, "end": offset + word["end"] / factor, "text": word["text"]}
+        for word in words
+    ]
+
+
+def build_cues(words, max_chars=CAPTION_MAX_CHARS, max_seconds=CAPTION_MAX_SECONDS, max_gap=CAPTION_MAX_GAP):
+    """
+    Group words into caption cues.
+
+    A cue is closed when the next word would make it longer than max_chars
+    or max_seconds, or follows a pause of more than max_gap seconds.
+    Boundaries that are only punctuation are attached to the previous word.
+
+    Returns:
+        list: (start, end, text) tuples
+    """
+    cues = []
+    start = end = None
+    text = ""
+    for word in sorted(words, key=lambda w: w["start"]):
+        token = word["text"].strip()
+        if not token:
+            continue
+        if text and not any(c.isalnum() for c in token):
+            text += token
+            end = max(end, word["end"])
+            continue
+        if text and (len(text) + 1 + len(token) > max_chars
+                     or word["end"] - start > max_seconds
+                     or word["start"] - end > max_gap):
+            cues.append((start, end, text))
+            text = ""
+        if not text:
+            start = word["start"]
+            text = token
+        else:
+            text += " " + token
+        end = max(end or 0.0, word["end"])
+    if text:
+        cues.append((start, end, text))
+    return cues
+
+
+def _timestamp(seconds, separator):
+    millis = max(0, round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def format_srt(cues):
+    blocks = [
+        f"{i}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{text}\n"
+        for i, (start, end, text) in enumerate(cues, 1)
+    ]
+    return "\n".join(blocks)
+
+
+def format_vtt(cues):
+    blocks = [f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n" for start, end, text in cues]
+    return "WEBVTT\n\n" + "\n".join(blocks)
+
+
+def write_captions(words, audio_path):
+    """
+    Write SRT and WebVTT captions next to an audio file.
+
+    Args:
+        words (list): Word timings on the audio's timeline (see shift_words)
+        audio_path (str): The audio file; captions get the same name with .srt / .vtt
+
+    Returns:
+        dict: {"srt": path, "vtt": path, "cues": number of cues}
+    """
+    cues = build_cues(words)
+    base = os.path.splitext(audio_path)[0]
+    paths = {}
+    for fmt, render in (("srt", format_srt), ("vtt", format_vtt)):
+        paths[fmt] = f"{base}.{fmt}"
+        with open(paths[fmt], "w", encoding="utf-8") as f:
+            f.write(render(cues))
+    print(f"Captions: {len(words)} words in {len(cues)} cues")
+    return dict(paths, cues=len(cues))
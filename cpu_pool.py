@@ -0,0 +1,88 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# CPU stage settings (override with environment variables)
+# TTS_CPU_WORKERS=0 runs decode/effects/encode in the calling thread instead
+CPU_WORKERS = int(os.getenv("TTS_CPU_WORKERS", str(os.cpu_count() or 1)))
+CPU_START_METHOD = os.getenv("TTS_CPU_START_METHOD", "forkserver")
+
+
+class CPUStage:
+    """
+    Run CPU-bound pipeline steps (decode, DSP, encode) in worker processes.
+
+    The synthesis event loops only do network I/O; when a job's audio is
+    complete it is handed to this stage and the loop awaits the result
+    without holding the GIL. Calls wait in the pool's queue until a
+    worker process is free, so CPU work scales with TTS_CPU_WORKERS.
+    """
+
+    def __init__(self, workers=CPU_WORKERS, start_method=CPU_START_METHOD):
+        self.workers = workers
+        self.active = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        if workers > 0:
+            # Not fork: the parent has event loop threads and database connections
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(start_method if start_method in methods else "spawn")
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) in a worker process and return its result.
+
+        func and its arguments must be picklable (module-level functions,
+        bytes, AudioSegments, paths).
+        """
+        with self._lock:
+            self.active += 1
+        try:
+            if self._pool is None:
+                return func(*args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+_stage = None
+_stage_pid = None
+_stage_lock = threading.Lock()
+
+
+def get_cpu_stage():
+    """
+    Return this process's CPU stage, starting its worker pool on first use.
+
+    The pool is stopped by job_queue.shutdown_executor() once queued jobs
+    have finished, not by an atexit hook of its own (see there).
+    """
+    global _stage, _stage_pid
+    with _stage_lock:
+        if _stage is None or _stage_pid != os.getpid():
+            _stage = CPUStage()
+            _stage_pid = os.getpid()
+        return _stage
+
+
+def shutdown_cpu_stage():
+    """Stop this process's CPU stage if it was started"""
+    global _stage
+    with _stage_lock:
+        stage = _stage if _stage_pid == os.getpid() else None
+        _stage = None
+    if stage is not None:
+        stage.shutdown()
+
+
+async def run_cpu(func, *args):
+    """Shortcut for get_cpu_stage().run(func, *args)"""
+    return await get_cpu_stage().run(func, *args)
@@ -0,0 +1,385 @@
+import math
+import numpy as np
+
+# Block size for the streaming filters, in frames
+BLOCK_FRAMES = 65536
+
+_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def segment_to_array(audio):
+    """
+    View an AudioSegment's PCM as a (frames, channels) integer array (no copy).
+    """
+    samples = np.frombuffer(audio.raw_data, dtype=_DTYPES[audio.sample_width])
+    return samples.reshape(-1, audio.channels)
+
+
+def array_to_segment(samples, like):
+    """Wrap a (frames, channels) integer array as an AudioSegment in the format of like"""
+    return like._spawn(np.ascontiguousarray(samples, dtype=_DTYPES[like.sample_width]).tobytes())
+
+
+def _sample_limits(dtype):
+    info = np.iinfo(dtype)
+    return info.min, info.max
+
+
+class OnePoleLowPass:
+    """
+    First-order (RC) low-pass filter, the same one pydub.effects.low_pass_filter uses:
+
+        y[n] = y[n-1] + alpha * (x[n] - y[n-1])
+
+    Unlike pydub's per-sample Python loop, blocks are filtered with NumPy.
+    The filter state is carried between calls to process(), so a long
+    signal can be fed block by block.
+    """
+
+    def __init__(self, cutoff, frame_rate):
+        rc = 1.0 / (cutoff * 2 * math.pi)
+        dt = 1.0 / frame_rate
+        self.alpha = dt / (rc + dt)
+        self.decay = 1.0 - self.alpha
+        self.state = None  # last output sample per channel
+
+        # Taps until the impulse response has decayed below 1e-10
+        if self.decay <= 0:
+            self.taps = 1
+        else:
+            self.taps = max(1, math.ceil(math.log(1e-10) / math.log(self.decay)))
+
+    def process(self, x):
+        """
+        Filter one block.
+
+        Args:
+            x (np.ndarray): (frames, channels) float64 samples
+
+        Returns:
+            np.ndarray: Filtered (frames, channels) float64 samples
+        """
+        if len(x) == 0:
+            return x.copy()
+        if self.state is None:
+            # pydub starts the filter at the first input sample
+            self.state = x[0].astype(np.float64)
+
+        if self.taps <= 64:
+            y = self._process_fir(x)
+        else:
+            y = self._process_segments(x)
+        self.state = y[-1].copy()
+        return y
+
+    def _process_fir(self, x):
+        # Fast decay: truncated impulse response, exact to ~1e-10
+        n = len(x)
+        kernel = self.alpha * self.decay ** np.arange(self.taps)
+        y = np.empty_like(x, dtype=np.float64)
+        for ch in range(x.shape[1]):
+            y[:, ch] = np.convolve(x[:, ch], kernel)[:n]
+        # Contribution of the carried state: decay^(n+1) * y[-1]
+        carry = self.decay ** np.arange(1, min(n, self.taps) + 1)
+        y[:len(carry)] += carry[:, None] * self.state
+        return y
+
+    def _process_segments(self, x):
+        # Slow decay: within a segment, y[j] = a^(j+1) * (y_prev + sum_i alpha * x[i] * a^-(i+1)),
+        # computed with cumsum. Segments are short enough that a^-j stays in float64 range.
+        segment = int(min(16384, max(64, 300 / -math.log(self.decay))))
+        y = np.empty_like(x, dtype=np.float64)
+        state = self.state
+        for start in range(0, len(x), segment):
+            block = x[start:start + segment]
+            growth = self.decay ** -np.arange(1, len(block) + 1, dtype=np.float64)[:, None]
+            out = (state + np.cumsum(self.alpha * block * growth, axis=0)) / growth
+            y[start:start + segment] = out
+            state = out[-1]
+        return y
+
+
+def fade_gains(fade_frames, frame_rate, fade_in=True):
+    """
+    Linear amplitude ramp for a fade, like pydub's fade_in/fade_out: stepped
+    once per millisecond for fades over 100 ms, once per sample for shorter ones.
+    """
+    fade_ms = max(1, fade_frames * 1000 // frame_rate)
+    if fade_ms > 100:
+        ramp = (np.arange(fade_frames) * 1000 // frame_rate) / fade_ms
+    else:
+        ramp = np.arange(fade_frames) / max(1, fade_frames)
+    return ramp if fade_in else 1.0 - ramp
+
+
+def apply_fades(samples, frame_rate, fade_frames):
+    """Fade both ends of a (frames, channels) integer array in place"""
+    fade_frames = min(fade_frames, len(samples))
+    if fade_frames <= 0:
+        return samples
+    head = samples[:fade_frames]
+    head[...] = np.trunc(head * fade_gains(fade_frames, frame_rate)[:, None])
+    tail = samples[-fade_frames:]
+    tail[...] = np.trunc(tail * fade_gains(fade_frames, frame_rate, fade_in=False)[:, None])
+    return samples
+
+
+class DepthFilter:
+    """
+    Block-by-block "depth" filtering: low-pass at 18000 - depth * 3000 Hz
+    plus a +3 dB-per-level bass copy (low-pass at 300 Hz) mixed back in.
+    Filter state carries over between blocks; fades are separate (FadeEnvelope).
+    """
+
+    def __init__(self, frame_rate, depth, dtype=np.int16):
+        self.dtype = np.dtype(dtype)
+        self.low, self.high = _sample_limits(self.dtype)
+        self.tone = OnePoleLowPass(18000 - (depth * 3000), frame_rate)
+        self.bass = OnePoleLowPass(300, frame_rate)
+        self.bass_gain = 10 ** (((depth - 1) * 3) / 20.0)
+
+    def process(self, block):
+        filtered = np.trunc(self.tone.process(block.astype(np.float64)))
+        boosted = np.clip(np.trunc(self.bass.process(filtered)) * self.bass_gain, self.low, self.high)
+        np.clip(filtered + boosted, self.low, self.high, out=filtered)
+        return filtered.astype(self.dtype)
+
+    def flush(self):
+        return np.empty((0, 1), dtype=self.dtype)
+
+
+def _fade_frames(frames, frame_rate, max_fade_ms=200):
+    # min(200 ms, 1/20 of the length), as the pydub chain did
+    return min(max_fade_ms, frames * 1000 // frame_rate // 20) * frame_rate // 1000
+
+
+class FadeEnvelope:
+    """
+    Streaming version of the depth fades.
+
+    The fade length depends on the total length, so the start is held back
+    until enough audio has arrived to know it is the full max_fade_ms, and
+    the last max_fade_ms are always held back until flush().
+    """
+
+    def __init__(self, frame_rate, max_fade_ms=200):
+        self.frame_rate = frame_rate
+        self.max_fade_ms = max_fade_ms
+        self.fade_frames = max_fade_ms * frame_rate // 1000
+        self._known_after = -(-max_fade_ms * 20 * frame_rate // 1000)
+        self._head = []
+        self._head_frames = 0
+        self._tail = None
+
+    def process(self, block):
+        if self._head is not None:
+            self._head.append(block)
+            self._head_frames += len(block)
+            if self._head_frames < self._known_after:
+                return block[:0]
+            data = np.concatenate(self._head)
+            self._head = None
+            head = data[:self.fade_frames]
+            head[...] = np.trunc(head * fade_gains(len(head), self.frame_rate)[:, None])
+            block = data
+
+        if self._tail is not None:
+            block = np.concatenate([self._tail, block])
+        split = max(0, len(block) - self.fade_frames)
+        self._tail = block[split:].copy()
+        return block[:split]
+
+    def flush(self):
+        if self._head is not None:
+            # Shorter than the point where the fade length is known
+            if not self._head:
+                return np.empty((0, 1), dtype=np.int16)
+            data = np.concatenate(self._head)
+            return apply_fades(data, self.frame_rate, _fade_frames(len(data), self.frame_rate, self.max_fade_ms))
+        tail = self._tail
+        tail[...] = np.trunc(tail * fade_gains(len(tail), self.frame_rate, fade_in=False)[:, None])
+        return tail
+
+
+def apply_depth(samples, frame_rate, depth, block_frames=BLOCK_FRAMES):
+    """
+    Run the "depth" effect chain on a PCM array in a single pass.
+
+    Same chain as the pydub version in tts.py used to run:
+    low-pass at 18000 - depth * 3000 Hz, a +3 dB-per-level bass copy
+    (low-pass at 300 Hz) mixed back in, and short fades at both ends.
+    The signal is processed in blocks of block_frames, so only a block's
+    worth of float intermediates exists at a time.
+
+    Args:
+        samples (np.ndarray): (frames, channels) integer PCM
+        frame_rate (int): Sample rate in Hz
+        depth (int): Depth level (1 = no effect)
+
+    Returns:
+        np.ndarray: New (frames, channels) array of the same dtype
+    """
+    if depth <= 1:
+        return samples.copy()
+
+    depth_filter = DepthFilter(frame_rate, depth, samples.dtype)
+    out = np.empty_like(samples)
+    for start in range(0, len(samples), block_frames):
+        out[start:start + block_frames] = depth_filter.process(samples[start:start + block_frames])
+    return apply_fades(out, frame_rate, _fade_frames(len(out), frame_rate))
+
+
+def _best_offset(reference, candidates):
+    """Offset into candidates of the window that correlates best with reference"""
+    return int(np.argmax(np.correlate(candidates, reference, mode="valid")))
+
+
+class TimeStretcher:
+    """
+    Change the tempo of PCM without changing its pitch (WSOLA), block by block.
+
+    Output frames of window_ms are overlap-added with a Hann window at half
+    a window apart. Each one is taken from near its nominal input position
+    (+/- tolerance_ms), at the offset that best continues the previous
+    frame, so waveforms line up and no phasing is heard. The similarity
+    search runs on a decimated mono mix and is then refined at full rate.
+
+    Only the input around the current frame is kept, so memory use does
+    not depend on the length of the audio. Feed blocks with process() and
+    call flush() at the end; the result is round(input frames / rate) long.
+    """
+
+    def __init__(self, frame_rate, channels, rate, window_ms=30, tolerance_ms=10, dtype=np.int16):
+        if rate <= 0:
+            raise ValueError(f"Invalid stretch rate: {rate}")
+        self.rate = rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.low, self.high = _sample_limits(self.dtype)
+        self.window = max(8, int(frame_rate * window_ms / 1000) // 2 * 2)
+        self.hop = self.window // 2
+        self.tolerance = max(1, int(frame_rate * tolerance_ms / 1000))
+        self.decimation = max(1, frame_rate // 8000)
+        # Periodic Hann: windows half a window apart sum to exactly 1
+        self._fade = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.window) / self.window))[:, None]
+
+        # Input, in "padded" coordinates: tolerance frames of silence, then the signal
+        self._input = np.zeros((self.tolerance, channels))
+        self._mono = np.zeros(self.tolerance)
+        self._base = 0  # padded coordinate of self._input[0]
+        self._received = 0
+
+        self._k = 0
+        self._previous = self.tolerance
+        self._overlap = np.zeros((self.window, channels))  # output from k * hop on
+        self._ready = []
+        self._emitted = 0
+
+    def _position(self, nominal, coarse):
+        """Input position for the next frame: best continuation of the previous one"""
+        d, hop, tolerance = self.decimation, self.hop, self.tolerance
+        target = self._previous + hop - self._base
+        c_start = (nominal - tolerance - self._base) // d
+        c_target, c_hop = target // d, hop // d
+        region = coarse[c_start:c_start + (2 * tolerance) // d + c_hop + 1]
+        position = (c_start + _best_offset(coarse[c_target:c_target + c_hop], region)) * d
+
+        if d > 1:
+            start = max(0, position - d)
+            region = self._mono[start:start + 2 * d + hop + 1]
+            position = start + _best_offset(self._mono[target:target + hop], region)
+        return position + self._base
+
+    def _run(self, final):
+        window, hop, tolerance = self.window, self.hop, self.tolerance
+        output_frames = int(round(self._received / self.rate))
+        frame_count = output_frames // hop + 1
+        available = self._base + len(self._input)
+        # Decimated mono mix; self._base is always a multiple of the decimation
+        d = self.decimation
+        coarse = self._mono[:len(self._mono) // d * d].reshape(-1, d).mean(axis=1)
+
+        while not final or self._k < frame_count:
+            nominal = tolerance + int(round(self._k * hop * self.rate))
+            if not final and nominal + tolerance + window + 3 * self.decimation + 1 > available:
+                break
+            position = nominal if self._k == 0 else self._position(nominal, coarse)
+            frame = self._input[position - self._base:position - self._base + window]
+            if self._k == 0:
+                # The first half window has no overlap partner: no fade-in
+                self._overlap[:hop] = frame[:hop]
+                self._overlap[hop:] += frame[hop:] * self._fade[hop:]
+            else:
+                self._overlap += frame * self._fade
+            self._ready.append(self._overlap[:hop].copy())
+            self._overlap = np.concatenate([self._overlap[hop:], np.zeros((hop, self.channels))])
+            self._previous = position
+            self._k += 1
+
+        # Drop input that no later frame can reach (keeping decimation alignment)
+        nominal = tolerance + int(round(self._k * hop * self.rate))
+        keep = min(self._previous + hop, nominal - tolerance) - 2 * self.decimation
+        keep = max(self._base, keep // self.decimation * self.decimation)
+        self._input = self._input[keep - self._base:]
+        self._mono = self._mono[keep - self._base:]
+        self._base = keep
+
+        out = np.concatenate(self._ready) if self._ready else np.zeros((0, self.channels))
+        count = max(0, min(len(out), output_frames - self._emitted))
+        self._ready = [out[count:]] if count < len(out) else []
+        self._emitted += count
+        return np.clip(np.round(out[:count]), self.low, self.high).astype(self.dtype)
+
+    def _append(self, samples):
+        samples = samples.astype(np.float64)
+        self._input = np.concatenate([self._input, samples])
+        self._mono = np.concatenate([self._mono, samples.mean(axis=1)])
+
+    def process(self, block):
+        if len(block) == 0:
+            return block.astype(self.dtype)
+        self._append(block)
+        self._received += len(block)
+        return self._run(final=False)
+
+    def flush(self):
+        # Pad with silence so every remaining search region stays in bounds
+        pad = int(self.hop * self.rate) + 2 * self.tolerance + 2 * self.window
+        self._append(np.zeros((pad, self.channels)))
+        return self._run(final=True)
+
+
+def time_stretch(samples, frame_rate, rate, window_ms=30, tolerance_ms=10):
+    """
+    Change the tempo of a PCM array without changing its pitch (see TimeStretcher).
+
+    Args:
+        samples (np.ndarray): (frames, channels) integer PCM
+        frame_rate (int): Sample rate in Hz
+        rate (float): Speed factor, e.g. 1.25 plays 25% faster
+        window_ms (int): Analysis window length
+        tolerance_ms (int): Maximum shift from the nominal position
+
+    Returns:
+        np.ndarray: New (round(frames / rate), channels) array of the same dtype
+    """
+    if rate <= 0:
+        raise ValueError(f"Invalid stretch rate: {rate}")
+    if abs(rate - 1.0) < 1e-3 or len(samples) == 0:
+        return samples.copy()
+    stretcher = TimeStretcher(frame_rate, samples.shape[1], rate, window_ms, tolerance_ms, samples.dtype)
+    return np.concatenate([stretcher.process(samples), stretcher.flush()])
+
+
+def stretch_segment(audio, rate):
+    """AudioSegment wrapper around time_stretch"""
+    if abs(rate - 1.0) < 1e-3:
+        return audio
+    return array_to_segment(time_stretch(segment_to_array(audio), audio.frame_rate, rate), audio)
+
+
+def depth_effect(audio, depth):
+    """AudioSegment wrapper around apply_depth"""
+    if depth <= 1:
+        return audio
+    return array_to_segment(apply_depth(segment_to_array(audio), audio.frame_rate, depth), audio)
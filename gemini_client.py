@@ -0,0 +1,173 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Gemini settings (override with environment variables)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+SCRIPT_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+SCRIPT_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "256"))
+# GEMINI_FAKE=1 answers from FakeModel instead of the API (local testing)
+GEMINI_FAKE = os.getenv("GEMINI_FAKE", "0") != "0"
+GEMINI_FAKE_DELAY = float(os.getenv("GEMINI_FAKE_DELAY", "0.05"))
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl=SCRIPT_CACHE_TTL, max_entries=SCRIPT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.time()
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class FakeModel:
+    """
+    Stand-in for genai.GenerativeModel that needs no API key or network.
+
+    Answers are derived from the prompt, so they are deterministic, and
+    streamed word by word with GEMINI_FAKE_DELAY seconds between chunks.
+    """
+
+    class _Chunk:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, model_name="fake", delay=GEMINI_FAKE_DELAY):
+        self.model_name = model_name
+        self.delay = delay
+
+    def _words(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        topic = " ".join(prompt.split()[:12])
+        return f"This is a generated script ({digest}) about: {topic}. Thanks for listening.".split(" ")
+
+    def _stream(self, prompt):
+        for i, word in enumerate(self._words(prompt)):
+            time.sleep(self.delay)
+            yield self._Chunk(word if i == 0 else f" {word}")
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.delay)
+        return self._Chunk(" ".join(self._words(prompt)))
+
+
+class ScriptClient:
+    """
+    Gemini text generation shared by all requests of a process.
+
+    genai is configured and the GenerativeModel is built once, on first use.
+    Finished responses are cached by model and prompt for SCRIPT_CACHE_TTL
+    seconds, so repeating the same request skips the API.
+    """
+
+    def __init__(self, api_key=None, model_name=GEMINI_MODEL, fake=GEMINI_FAKE, cache=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.fake = fake
+        self.cache = cache or TTLCache()
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                if self.fake:
+                    self._model = FakeModel(self.model_name)
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def _key(self, prompt):
+        return hashlib.sha256(f"{self.model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def is_cached(self, prompt):
+        return self._key(prompt) in self.cache
+
+    def generate(self, prompt):
+        """Return the full response text for prompt"""
+        key = self._key(prompt)
+        text = self.cache.get(key)
+        if text is None:
+            text = self.model.generate_content(prompt).text
+            self.cache.put(key, text)
+        return text
+
+    def stream(self, prompt):
+        """
+        Yield the response text for prompt in pieces as the model produces them.
+
+        A cached response is yielded in one piece. The response is only
+        cached once the stream has finished without errors.
+        """
+        key = self._key(prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            yield text
+            return
+
+        parts = []
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        self.cache.put(key, "".join(parts))
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_script_client(api_key=None):
+    """Return this process's ScriptClient, creating it on first use"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = ScriptClient(api_key or os.getenv("GEMINI_API_KEY"))
+            _client_pid = os.getpid()
+        return _client
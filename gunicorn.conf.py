@@ -0,0 +1,20 @@
+# gunicorn settings for the web process (see Procfile)
+import os
+
+# Sizing. Each worker process has its own job executor (TTS_MAX_CONCURRENT_JOBS), CPU pool
+# (TTS_CPU_WORKERS processes) and `threads` request threads. Status event streams and live audio
+# hold a thread for minutes, at most TTS_MAX_STREAMS per worker (app.py); the remaining threads
+# serve pages, uploads and downloads. So a server handles about workers * TTS_MAX_STREAMS open
+# status pages before they fall back to polling. Set TTS_CPU_WORKERS to about cores / workers.
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+worker_class = "gthread"
+
+# Leave time for queued TTS jobs to finish after the last request (TTS_SHUTDOWN_TIMEOUT, job_queue.py)
+graceful_timeout = int(float(os.getenv("TTS_SHUTDOWN_TIMEOUT", "30"))) + 10
+
+
+def worker_exit(server, worker):
+    # Drain the job queue, then stop the CPU pool - in that order (see job_queue.shutdown_executor)
+    from job_queue import shutdown_executor
+    shutdown_executor()
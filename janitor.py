@@ -0,0 +1,197 @@
+import os
+import time
+import fcntl
+import tempfile
+import threading
+
+# Retention settings (override with environment variables)
+JANITOR_ENABLED = os.getenv("TTS_JANITOR", "1") != "0"
+RETENTION_TTL = float(os.getenv("TTS_RETENTION_HOURS", "24")) * 3600
+RETENTION_MAX_BYTES = int(os.getenv("TTS_RETENTION_MAX_BYTES", str(2 * 1024 ** 3)))
+JANITOR_INTERVAL = float(os.getenv("TTS_JANITOR_INTERVAL", "600"))
+# Files younger than this are never touched (jobs may be writing them)
+MIN_AGE = float(os.getenv("TTS_RETENTION_MIN_AGE", "300"))
+
+TEMP_DIR = os.path.join(tempfile.gettempdir(), "tts_generator")
+
+
+class Janitor:
+    """
+    Delete old job files so uploads/, outputs/ and the temp dir stay bounded.
+
+    Each sweep first removes files older than ttl seconds, then the oldest
+    remaining files until the directories fit in max_bytes. Files that a
+    pending or processing job refers to, and files modified in the last
+    MIN_AGE seconds, are skipped. Subdirectories (such as the synthesis
+    cache, which has its own LRU limit) are not touched.
+
+    Sweeps run on a daemon thread; with several worker processes a lock
+    file makes sure only one of them sweeps at a time.
+    """
+
+    def __init__(self, directories, job_store=None, ttl=RETENTION_TTL, max_bytes=RETENTION_MAX_BYTES,
+                 interval=JANITOR_INTERVAL, min_age=MIN_AGE):
+        self.directories = list(directories)
+        self.job_store = job_store
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.min_age = min_age
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {
+            "runs": 0,
+            "files_reclaimed": 0,
+            "bytes_reclaimed": 0,
+            "expired_files": 0,
+            "quota_files": 0,
+            "errors": 0,
+            "files": 0,
+            "bytes": 0,
+            "last_run": None,
+            "last_duration_seconds": None,
+        }
+
+    def _active_paths(self):
+        """Files referenced by jobs that have not finished yet"""
+        if self.job_store is None:
+            return set()
+        paths = set()
+        for job in self.job_store.list_jobs(status=("pending", "processing"), limit=10000).values():
+            for field in ("script_file", "output_file", "result"):
+                if job.get(field):
+                    paths.add(os.path.abspath(job[field]))
+        return paths
+
+    def _scan(self):
+        files = []
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue  # lock files
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+                except FileNotFoundError:
+                    continue
+        files.sort()  # oldest first
+        return files
+
+    def _remove(self, path, size, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Janitor could not delete {path}: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            return False
+        with self._lock:
+            self._stats["files_reclaimed"] += 1
+            self._stats["bytes_reclaimed"] += size
+            self._stats[f"{reason}_files"] += 1
+        return True
+
+    def sweep(self):
+        """
+        Run one cleanup pass.
+
+        Returns:
+            dict: Files and bytes removed by this pass
+        """
+        started = time.time()
+        files = self._scan()
+        active = self._active_paths()
+        total = sum(size for _, size, _ in files)
+        removed_files = removed_bytes = 0
+
+        kept = []
+        for mtime, size, path in files:
+            age = started - mtime
+            if path in active or age < self.min_age:
+                kept.append((mtime, size, path))
+            elif age > self.ttl and self._remove(path, size, "expired"):
+                total -= size
+                removed_files += 1
+                removed_bytes += size
+            else:
+                kept.append((mtime, size, path))
+
+        for mtime, size, path in kept:
+            if total <= self.max_bytes:
+                break
+            if path in active or started - mtime < self.min_age:
+                continue
+            if self._remove(path, size, "quota"):
+                total -= size
+                removed_files += 1
+                removed_bytes += size
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["files"] = len(files) - removed_files
+            self._stats["bytes"] = total
+            self._stats["last_run"] = started
+            self._stats["last_duration_seconds"] = round(time.time() - started, 3)
+
+        if removed_files:
+            print(f"Janitor: removed {removed_files} files ({removed_bytes / 1024 ** 2:.1f} MB), "
+                  f"{total / 1024 ** 2:.1f} MB kept")
+        return {"files": removed_files, "bytes": removed_bytes}
+
+    def _run(self):
+        lock_path = os.path.join(TEMP_DIR, ".janitor.lock")
+        while True:
+            try:
+                os.makedirs(TEMP_DIR, exist_ok=True)
+                with open(lock_path, "w") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        self.sweep()
+                    except BlockingIOError:
+                        pass  # another worker process is sweeping
+            except Exception as e:
+                print(f"Janitor sweep failed: {e}")
+                with self._lock:
+                    self._stats["errors"] += 1
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tts-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, ttl_seconds=self.ttl, max_bytes=self.max_bytes)
+
+
+_janitor = None
+_janitor_pid = None
+_janitor_lock = threading.Lock()
+
+
+def get_janitor(directories=(), job_store=None):
+    """
+    Return this process's janitor, starting its thread on first use
+    (unless TTS_JANITOR=0). The temp dir is always included.
+    """
+    global _janitor, _janitor_pid
+    with _janitor_lock:
+        if _janitor is None or _janitor_pid != os.getpid():
+            _janitor = Janitor([*directories, TEMP_DIR], job_store)
+            _janitor_pid = os.getpid()
+            if JANITOR_ENABLED:
+                _janitor.start()
+        return _janitor
@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import threading
+from cpu_pool import shutdown_cpu_stage
+
+# Executor settings (override with environment variables)
+WORKER_LOOPS = int(os.getenv("TTS_WORKER_LOOPS", "1"))
+MAX_CONCURRENT_JOBS = int(os.getenv("TTS_MAX_CONCURRENT_JOBS", "8"))
+QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "100"))
+SHUTDOWN_TIMEOUT = float(os.getenv("TTS_SHUTDOWN_TIMEOUT", "30"))
+
+
+class QueueFull(Exception):
+    """Raised by JobExecutor.submit when no more jobs can be admitted"""
+
+
+class JobExecutor:
+    """
+    Run async jobs on a few long-lived event loops fed by a bounded queue.
+
+    Each loop thread runs at most max_concurrent / loops jobs at a time;
+    everything else waits in the queue. When the queue is full, submit()
+    raises QueueFull instead of piling up more work.
+    """
+
+    def __init__(self, loops=WORKER_LOOPS, max_concurrent=MAX_CONCURRENT_JOBS, queue_size=QUEUE_SIZE):
+        self.loops = max(1, loops)
+        self.max_concurrent = max(self.loops, max_concurrent)
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        self._workers = []  # (thread, loop, asyncio.Queue)
+        self._next_worker = 0
+        self._accepting = True
+        self._lock = threading.Lock()
+
+    def start(self):
+        per_loop = self.max_concurrent // self.loops
+        for i in range(self.loops):
+            ready = threading.Event()
+            worker = {}
+
+            def run(worker=worker, ready=ready):
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                worker["loop"] = loop
+                worker["queue"] = asyncio.Queue()
+                ready.set()
+                loop.run_until_complete(self._run_loop(worker["queue"], per_loop))
+                loop.close()
+
+            thread = threading.Thread(target=run, name=f"tts-worker-{i}", daemon=True)
+            thread.start()
+            ready.wait()
+            self._workers.append((thread, worker["loop"], worker["queue"]))
+
+    async def _run_loop(self, jobs_queue, limit):
+        semaphore = asyncio.Semaphore(limit)
+        tasks = set()
+
+        while True:
+            await semaphore.acquire()
+            item = await jobs_queue.get()
+            if item is None:
+                break
+            with self._lock:
+                self.queued -= 1
+            task = asyncio.create_task(self._run_job(semaphore, *item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Shutting down: let in-flight jobs finish
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_job(self, semaphore, func, args, enqueued):
+        with self._lock:
+            self.active += 1
+        try:
+            await func(*args, queue_wait=time.time() - enqueued)
+        except Exception as e:
+            print(f"Unhandled error in background job: {e}")
+        finally:
+            with self._lock:
+                self.active -= 1
+            semaphore.release()
+
+    def submit(self, func, *args):
+        """
+        Queue func(*args, queue_wait=seconds) to run on a worker loop.
+
+        Args:
+            func (callable): Async function; receives the seconds spent queued as queue_wait
+            *args: Positional arguments for func
+
+        Returns:
+            int: Number of jobs queued ahead of this one
+
+        Raises:
+            QueueFull: If the executor is shutting down or the queue is full
+        """
+        with self._lock:
+            if not self._accepting:
+                raise QueueFull("Server is shutting down")
+            if self.queued >= self.queue_size:
+                raise QueueFull(f"Job queue is full ({self.queue_size} waiting)")
+            position = self.queued
+            self.queued += 1
+            _, loop, jobs_queue = self._workers[self._next_worker]
+            self._next_worker = (self._next_worker + 1) % len(self._workers)
+
+        loop.call_soon_threadsafe(jobs_queue.put_nowait, (func, args, time.time()))
+        return position
+
+    def queue_depth(self):
+        return self.queued
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Stop accepting jobs, finish queued and in-flight ones, stop the loops,
+        then stop the CPU stage (cpu_pool.py) the jobs were using.
+        """
+        with self._lock:
+            self._accepting = False
+        deadline = time.time() + timeout
+        for thread, loop, jobs_queue in self._workers:
+            if thread.is_alive():
+                loop.call_soon_threadsafe(jobs_queue.put_nowait, None)
+        for thread, _, _ in self._workers:
+            thread.join(max(0.1, deadline - time.time()))
+        shutdown_cpu_stage()
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return this process's executor, starting it on first use.
+
+    Threads do not survive fork(), so a process forked after the executor
+    was created (e.g. gunicorn --preload workers) gets its own.
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = JobExecutor()
+            _executor_pid = os.getpid()
+            _executor.start()
+        return _executor
+
+
+def shutdown_executor():
+    """
+    Drain this process's executor, then stop the CPU stage.
+
+    Called from gunicorn's worker_exit hook (gunicorn.conf.py) and when the
+    development server stops. Not from atexit: concurrent.futures refuses
+    new work from its own exit hook, which runs before atexit hooks, so
+    queued jobs could no longer reach the CPU pool.
+    """
+    with _executor_lock:
+        executor = _executor if _executor_pid == os.getpid() else None
+    if executor is not None:
+        executor.shutdown()
+    else:
+        shutdown_cpu_stage()
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+
+# Job store settings (override with environment variables)
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+# Kept in a subdirectory: the janitor sweeps loose files in the temp dir
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "tts_generator", "jobs", "jobs.db"))
+
+
+class MemoryJobStore:
+    """
+    Job records kept in a dict of this process.
+
+    Only suitable for tests and single-process development servers:
+    other workers and restarts do not see these jobs.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, job, owner=None):
+        with self._lock:
+            self._jobs[job_id] = dict(job, updated=time.time())
+            self._owners[job_id] = owner
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None if it does not exist"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def updated_at(self, job_id):
+        """Timestamp of the last change to the job, or None if it does not exist"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job['updated'] if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated=time.time())
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._owners.pop(job_id, None)
+
+    def list_jobs(self, owner=None, since=None, status=None, limit=100):
+        """
+        Return {job_id: job} ordered by start time, newest first.
+
+        Args:
+            owner (str): Only jobs created by this session/user
+            since (float): Only jobs started at or after this timestamp
+            status (str or tuple): Only jobs with this status (or one of these)
+            limit (int): Maximum number of jobs
+        """
+        statuses = (status,) if isinstance(status, str) else status
+        with self._lock:
+            matches = [
+                (job_id, dict(job)) for job_id, job in self._jobs.items()
+                if (owner is None or self._owners[job_id] == owner)
+                and (since is None or job.get('start_time', 0) >= since)
+                and (statuses is None or job.get('status') in statuses)
+            ]
+        matches.sort(key=lambda item: item[1].get('start_time', 0), reverse=True)
+        return dict(matches[:limit])
+
+
+class SQLiteJobStore:
+    """
+    Job records in a SQLite database shared by all worker processes.
+
+    The database runs in WAL mode so status polls never block the workers
+    writing progress. Updates are applied with json_patch() inside SQLite,
+    without a read-modify-write round trip in Python.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                owner TEXT,
+                status TEXT,
+                start_time REAL,
+                updated REAL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_owner_time ON jobs (owner, start_time);
+            CREATE INDEX IF NOT EXISTS jobs_time ON jobs (start_time);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+        """)
+
+    def _conn(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id, job, owner=None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, owner, status, start_time, updated, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, owner, job.get('status'), job.get('start_time', time.time()), time.time(), json.dumps(job))
+        )
+
+    def get(self, job_id):
+        """Return the job record, or None if it does not exist"""
+        row = self._conn().execute("SELECT data, updated FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        job['updated'] = row[1]
+        return job
+
+    def updated_at(self, job_id):
+        """Timestamp of the last change to the job, or None if it does not exist"""
+        row = self._conn().execute("SELECT updated FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, job_id, **fields):
+        # Note: json_patch() removes keys whose new value is null
+        self._conn().execute(
+            "UPDATE jobs SET data = json_patch(data, ?), status = coalesce(?, status), updated = ? WHERE job_id = ?",
+            (json.dumps(fields), fields.get('status'), time.time(), job_id)
+        )
+
+    def delete(self, job_id):
+        self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def list_jobs(self, owner=None, since=None, status=None, limit=100):
+        """
+        Return {job_id: job} ordered by start time, newest first.
+
+        Args:
+            owner (str): Only jobs created by this session/user
+            since (float): Only jobs started at or after this timestamp
+            status (str or tuple): Only jobs with this status (or one of these)
+            limit (int): Maximum number of jobs
+        """
+        clauses, params = [], []
+        if owner is not None:
+            clauses.append("owner = ?")
+            params.append(owner)
+        if since is not None:
+            clauses.append("start_time >= ?")
+            params.append(since)
+        if status is not None:
+            statuses = (status,) if isinstance(status, str) else tuple(status)
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT job_id, data, updated FROM jobs {where} ORDER BY start_time DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+
+        jobs = {}
+        for job_id, data, updated in rows:
+            jobs[job_id] = json.loads(data)
+            jobs[job_id]['updated'] = updated
+        return jobs
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return this process's job store (JOB_STORE=sqlite|memory), creating it on first use"""
+    global _store, _store_pid
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            _store = MemoryJobStore() if JOB_STORE == "memory" else SQLiteJobStore()
+            _store_pid = os.getpid()
+        return _store
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Metrics settings (override with environment variables)
+# Each worker process writes its numbers here; /metrics combines all workers
+METRICS_DIR = os.getenv("TTS_METRICS_DIR", os.path.join(tempfile.gettempdir(), "tts_generator", "metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("TTS_METRICS_FLUSH_INTERVAL", "5"))
+
+# Pipeline stages with a duration histogram (synthesis is per fragment, the rest per job)
+STAGES = ("queue_wait", "synthesis", "decode", "speedup", "depth", "encode", "write")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# name -> (type, help)
+DEFINITIONS = {
+    "tts_stage_seconds": ("histogram", "Time spent per pipeline stage (synthesis per fragment, other stages per job)"),
+    "tts_job_seconds": ("histogram", "Time from job start to completion or failure, excluding queue wait"),
+    "tts_jobs_total": ("counter", "Finished TTS jobs by status"),
+    "tts_queue_depth": ("gauge", "Jobs waiting for a worker slot"),
+    "tts_active_jobs": ("gauge", "Jobs currently running"),
+    "tts_cache_requests_total": ("counter", "Synthesis cache lookups by result (hit rate = hit / (hit + miss))"),
+    "tts_cache_bytes": ("gauge", "Bytes stored in the synthesis cache"),
+    "tts_bytes_served_total": ("counter", "Audio bytes sent to clients by route"),
+    "tts_streams_rejected_total": ("counter", "Long-lived streams refused with 503 because all stream slots were taken"),
+    "tts_synthesis_attempts_total": ("counter", "Synthesis backend attempts by outcome"),
+    "tts_synthesis_hedges_total": ("counter", "Duplicate synthesis requests sent for slow attempts"),
+    "tts_storage_bytes": ("gauge", "Bytes of job files kept on disk (last janitor sweep)"),
+    "tts_janitor_files_reclaimed_total": ("counter", "Job files deleted by the janitor by reason (expired or over quota)"),
+    "tts_janitor_bytes_reclaimed_total": ("counter", "Bytes freed by the janitor"),
+}
+
+# Gauges of a worker's own state are added up across workers. Every other gauge
+# describes shared state (cache directory, job files) that each worker reports in full.
+PER_WORKER_GAUGES = ("tts_queue_depth", "tts_active_jobs")
+
+# Counters and histograms of workers that have exited, so totals never go down
+RETIRED_FILE = "retired.json"
+
+
+@contextmanager
+def timed(timings, stage):
+    """Add the time spent in the with block to timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Counters and histograms of one process, in Prometheus text format.
+
+    Values are kept in memory and written to METRICS_DIR/<pid>.json every
+    METRICS_FLUSH_INTERVAL seconds; render() adds up the files of all live
+    processes, so any gunicorn worker can answer a scrape. Gauges and
+    process-wide totals kept elsewhere (cache, executor) come from
+    collectors: callables returning (name, labels, value) tuples, sampled
+    at flush time.
+
+    When a worker exits, its counters and histograms are folded into
+    METRICS_DIR/retired.json, so restarts do not make totals go down
+    (which Prometheus would read as a counter reset). Its gauges are dropped.
+    """
+
+    def __init__(self, directory=METRICS_DIR, interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            values = self._histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def add_collector(self, collector):
+        """Register a collector (adding the same one again has no effect)"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def snapshot(self):
+        """This process's values as a JSON-friendly dict"""
+        samples = []
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()]
+        samples = [[name, sorted(labels.items()), value] for name, labels, value in samples]
+        return {"counters": counters + samples, "histograms": histograms}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def flush(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self._path(f".{os.getpid()}")
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, self._path(os.getpid()))
+
+    def _snapshots(self):
+        """Snapshots of this process (fresh) and of all other live processes"""
+        snapshots = [self.snapshot()]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            pid = name[:-5]
+            if not name.endswith(".json") or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                # Worker is gone (restarted): keep its totals, drop its gauges
+                self._retire(os.path.join(self.directory, name))
+                continue
+            except PermissionError:
+                pass
+            snapshot = _read_snapshot(os.path.join(self.directory, name))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        retired = _read_snapshot(os.path.join(self.directory, RETIRED_FILE))
+        if retired is not None:
+            snapshots.append(retired)
+        return snapshots
+
+    def _retire(self, path):
+        """Fold the counters and histograms of an exited process into retired.json"""
+        retired_path = os.path.join(self.directory, RETIRED_FILE)
+        # Workers scrape concurrently; the lock makes sure each file is folded in once
+        with open(os.path.join(self.directory, ".retired.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            snapshot = _read_snapshot(path)
+            if snapshot is None:
+                return
+            totals = _read_snapshot(retired_path) or {"counters": [], "histograms": []}
+            counters, histograms = _merge([totals, snapshot], counters_only=True)
+            temp_path = f"{retired_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({
+                    "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+                    "histograms": [[name, list(labels), values] for (name, labels), values in histograms.items()],
+                }, f)
+            os.replace(temp_path, retired_path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def render(self):
+        """All processes' metrics in the Prometheus text exposition format"""
+        counters, histograms = _merge(self._snapshots())
+
+        lines = []
+        for name, (kind, help_text) in DEFINITIONS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (sample, labels), value in sorted(counters.items()):
+                if sample == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (sample, labels), values in sorted(histograms.items()):
+                if sample != name:
+                    continue
+                for bound, count in zip(BUCKETS, values):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {values[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Metrics flush failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tts-metrics", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+            self._retire(self._path(os.getpid()))
+        except OSError as e:
+            print(f"Metrics retire failed: {e}")
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots, counters_only=False):
+    """
+    Combine snapshots of several processes.
+
+    Counters and histograms are added up. Gauges are added up for
+    PER_WORKER_GAUGES and take the largest value otherwise; with
+    counters_only they are left out.
+
+    Returns:
+        tuple: ({(name, labels): value}, {(name, labels): [bucket counts..., sum, count]})
+    """
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            kind = DEFINITIONS.get(name, ("counter",))[0]
+            if kind == "gauge" and counters_only:
+                continue
+            if kind == "gauge" and name not in PER_WORKER_GAUGES:
+                counters[key] = max(counters.get(key, value), value)
+            else:
+                counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(merged, values)]
+    return counters, histograms
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+_metrics = None
+_metrics_pid = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return this process's Metrics, starting its flush thread on first use"""
+    global _metrics, _metrics_pid
+    with _metrics_lock:
+        if _metrics is None or _metrics_pid != os.getpid():
+            _metrics = Metrics()
+            _metrics_pid = os.getpid()
+            _metrics.start()
+        return _metrics
@@ -0,0 +1,130 @@
+import os
+
+# Profile used when a request does not pick one (override per deployment)
+DEFAULT_PROFILE = os.getenv("TTS_OUTPUT_PROFILE", "mp3")
+
+# edge-tts delivers 24 kHz mono MP3 at 48 kbit/s
+SOURCE_FORMAT = {"format": "mp3", "bitrate_kbps": 48, "channels": 1, "sample_rate": 24000}
+
+# channels / sample_rate of None keep the format of the synthesized audio
+PROFILES = {
+    "mp3": {
+        "label": "MP3 192 kbps",
+        "format": "mp3", "codec": "libmp3lame", "bitrate": "192k",
+        "channels": None, "sample_rate": None,
+    },
+    "mp3-speech": {
+        "label": "MP3 64 kbps mono (speech)",
+        "format": "mp3", "codec": "libmp3lame", "bitrate": "64k",
+        "channels": 1, "sample_rate": 24000,
+    },
+    "mp3-low": {
+        "label": "MP3 32 kbps mono (smallest MP3)",
+        "format": "mp3", "codec": "libmp3lame", "bitrate": "32k",
+        "channels": 1, "sample_rate": 24000,
+    },
+    "opus": {
+        "label": "Opus 32 kbps mono (OGG)",
+        "format": "ogg", "codec": "libopus", "bitrate": "32k",
+        "channels": 1, "sample_rate": 24000,
+    },
+    "opus-hq": {
+        "label": "Opus 64 kbps (OGG)",
+        "format": "ogg", "codec": "libopus", "bitrate": "64k",
+        "channels": None, "sample_rate": 48000,
+    },
+    "original": {
+        "label": "Original edge-tts MP3 (no re-encode when possible)",
+        "format": "mp3", "codec": "libmp3lame", "bitrate": "48k",
+        "channels": None, "sample_rate": None,
+    },
+}
+
+EXTENSIONS = {"mp3": "mp3", "ogg": "ogg"}
+MIMETYPES = {"mp3": "audio/mpeg", "ogg": "audio/ogg"}
+SAMPLE_RATES = (16000, 22050, 24000, 44100, 48000)
+# libopus only accepts these input rates
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def resolve_profile(name=None, channels=None, sample_rate=None, bitrate=None):
+    """
+    Look up an output profile and apply per-request overrides.
+
+    Args:
+        name (str): Profile name from PROFILES (default: TTS_OUTPUT_PROFILE)
+        channels (int): 1 or 2 to force mono/stereo
+        sample_rate (int): Output sample rate in Hz
+        bitrate (str): Bitrate such as "48k"
+
+    Returns:
+        dict: Profile settings, including "name", "extension" and "mimetype"
+
+    Raises:
+        ValueError: For an unknown profile or invalid override
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown output profile: {name}")
+    profile = dict(PROFILES[name], name=name)
+
+    if channels:
+        if int(channels) not in (1, 2):
+            raise ValueError(f"Channels must be 1 or 2, not {channels}")
+        profile["channels"] = int(channels)
+    if sample_rate:
+        if int(sample_rate) not in SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+        profile["sample_rate"] = int(sample_rate)
+    if bitrate:
+        if not str(bitrate).rstrip("k").isdigit():
+            raise ValueError(f"Invalid bitrate: {bitrate}")
+        profile["bitrate"] = f"{str(bitrate).rstrip('k')}k"
+
+    if profile["codec"] == "libopus" and profile["sample_rate"] not in OPUS_SAMPLE_RATES:
+        # Unset or unsupported rate: let Opus run at its native 48 kHz
+        profile["sample_rate"] = 48000
+
+    profile["extension"] = EXTENSIONS[profile["format"]]
+    profile["mimetype"] = MIMETYPES[profile["format"]]
+    return profile
+
+
+def accepts_source(profile):
+    """
+    True if the edge-tts MP3 can be delivered as-is for this profile: same
+    container, no format change asked for, and already at or below the
+    requested bitrate (re-encoding would only add bytes).
+    """
+    return (
+        profile["format"] == SOURCE_FORMAT["format"]
+        and profile["channels"] in (None, SOURCE_FORMAT["channels"])
+        and profile["sample_rate"] in (None, SOURCE_FORMAT["sample_rate"])
+        and SOURCE_FORMAT["bitrate_kbps"] <= int(profile["bitrate"].rstrip("k"))
+    )
+
+
+def cache_params(profile):
+    """Profile settings that change the encoded bytes (for cache keys)"""
+    return {k: profile[k] for k in ("format", "codec", "bitrate", "channels", "sample_rate")}
+
+
+def encoder_args(profile):
+    """ffmpeg output arguments for a profile"""
+    args = ["-f", profile["format"], "-acodec", profile["codec"], "-b:a", profile["bitrate"]]
+    if profile["channels"]:
+        args += ["-ac", str(profile["channels"])]
+    if profile["sample_rate"]:
+        args += ["-ar", str(profile["sample_rate"])]
+    return args
+
+
+def export_segment(audio, path, profile):
+    """Encode an AudioSegment to path with a profile"""
+    parameters = []
+    if profile["channels"]:
+        parameters += ["-ac", str(profile["channels"])]
+    if profile["sample_rate"]:
+        parameters += ["-ar", str(profile["sample_rate"])]
+    audio.export(path, format=profile["format"], codec=profile["codec"],
+                 bitrate=profile["bitrate"], parameters=parameters)
@@ -0,0 +1,210 @@
+import threading
+import subprocess
+import numpy as np
+from pydub import AudioSegment
+from dsp import BLOCK_FRAMES, fade_gains
+from metrics import timed
+
+# edge-tts output format (audio-24khz-48kbitrate-mono-mp3)
+FRAME_RATE = 24000
+CHANNELS = 1
+
+
+class _ErrorLog:
+    """
+    Read an ffmpeg stderr pipe in the background, keeping only the last
+    few KB. Unread, a chatty stderr fills the pipe buffer and stalls ffmpeg.
+    """
+
+    def __init__(self, pipe, limit=4096):
+        self.text = b""
+        self._pipe = pipe
+        self._limit = limit
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        for line in self._pipe:
+            self.text = (self.text + line)[-self._limit:]
+        self._pipe.close()
+
+    def result(self):
+        self._thread.join()
+        return self.text.decode(errors="replace").strip()
+
+
+def decode_blocks(data_chunks, format="mp3", frame_rate=FRAME_RATE, channels=CHANNELS, block_frames=BLOCK_FRAMES):
+    """
+    Decode encoded audio through an ffmpeg pipe, block by block.
+
+    Args:
+        data_chunks (iterable): Encoded audio as a sequence of bytes objects
+        format (str): Input container/codec for ffmpeg
+        frame_rate (int): Output sample rate
+        channels (int): Output channel count
+        block_frames (int): Frames per yielded block (the last one may be shorter)
+
+    Yields:
+        np.ndarray: (frames, channels) int16 PCM blocks
+    """
+    process = subprocess.Popen(
+        [AudioSegment.converter, "-hide_banner", "-loglevel", "error",
+         "-f", format, "-i", "pipe:0",
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(frame_rate), "-ac", str(channels), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    errors = _ErrorLog(process.stderr)
+
+    # Feed stdin from a thread: ffmpeg blocks on stdout if nobody reads it
+    def feed():
+        try:
+            for data in data_chunks:
+                process.stdin.write(data)
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    frame_bytes = 2 * channels
+    try:
+        while True:
+            data = process.stdout.read(block_frames * frame_bytes)
+            if not data:
+                break
+            data = data[:len(data) // frame_bytes * frame_bytes]
+            yield np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        feeder.join()
+        process.wait()
+
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg decode failed: {errors.result()}")
+
+
+class PCMEncoder:
+    """
+    Encode int16 PCM blocks to a file through an ffmpeg pipe.
+
+    output_args are the ffmpeg output options (format, codec, bitrate,
+    channel/sample rate conversion), see output_profiles.encoder_args().
+    """
+
+    def __init__(self, path, frame_rate=FRAME_RATE, channels=CHANNELS, output_args=("-f", "mp3", "-b:a", "192k")):
+        self.path = path
+        self._process = subprocess.Popen(
+            [AudioSegment.converter, "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "s16le", "-ar", str(frame_rate), "-ac", str(channels), "-i", "pipe:0",
+             *output_args, path],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        self._errors = _ErrorLog(self._process.stderr)
+
+    def write(self, block):
+        if len(block):
+            self._process.stdin.write(np.ascontiguousarray(block, dtype=np.int16).tobytes())
+
+    def close(self):
+        """Finish the file; raises if ffmpeg failed"""
+        self._process.stdin.close()
+        self._process.wait()
+        if self._process.returncode != 0:
+            raise Exception(f"ffmpeg encode failed: {self._errors.result()}")
+
+    def abort(self):
+        self._process.kill()
+        self._process.wait()
+
+
+def _take(blocks, frames):
+    """Read at least frames frames from a block iterator (fewer if it ends first), or None"""
+    parts, count = [], 0
+    for block in blocks:
+        parts.append(block)
+        count += len(block)
+        if count >= frames:
+            break
+    return np.concatenate(parts) if parts else None
+
+
+def crossfade_blocks(streams, frame_rate, crossfade_ms):
+    """
+    Chain block streams, crossfading each boundary over crossfade_ms.
+
+    Only the end of the previous stream and the start of the next one are
+    held in memory at a time.
+    """
+    overlap = crossfade_ms * frame_rate // 1000
+    held = None
+    for stream in streams:
+        stream = iter(stream)
+        head = _take(stream, overlap)
+        if head is None:
+            continue
+        if held is not None and overlap:
+            n = min(overlap, len(held), len(head))
+            mixed = (held[len(held) - n:] * fade_gains(n, frame_rate, fade_in=False)[:, None]
+                     + head[:n] * fade_gains(n, frame_rate)[:, None])
+            head = np.concatenate([held[:len(held) - n], np.clip(mixed, -32768, 32767).astype(np.int16), head[n:]])
+        elif held is not None:
+            yield held
+
+        buffer = head
+        for block in stream:
+            if len(buffer) > overlap:
+                yield buffer[:len(buffer) - overlap]
+                buffer = buffer[len(buffer) - overlap:]
+            buffer = np.concatenate([buffer, block])
+        held = buffer
+
+    if held is not None:
+        yield held
+
+
+def timed_blocks(blocks, timings, stage):
+    """Pass blocks through, adding the time spent waiting for each one to timings[stage]"""
+    blocks = iter(blocks)
+    while True:
+        with timed(timings, stage):
+            block = next(blocks, None)
+        if block is None:
+            return
+        yield block
+
+
+def process_blocks(blocks, stages, timings=None):
+    """
+    Run PCM blocks through a chain of processors (objects with process() and flush()).
+
+    Args:
+        blocks (iterable): Input PCM blocks
+        stages (list): (name, processor) pairs, applied in order
+        timings (dict): Optional dict; the time spent in each processor is
+            added to timings[name]
+
+    Yields:
+        np.ndarray: Output blocks, in order
+    """
+    timings = {} if timings is None else timings
+
+    def run(block, stages):
+        for name, stage in stages:
+            if not len(block):
+                break
+            with timed(timings, name):
+                block = stage.process(block)
+        return block
+
+    for block in blocks:
+        block = run(block, stages)
+        if len(block):
+            yield block
+    # Flush each stage through the ones after it
+    for i, (name, stage) in enumerate(stages):
+        with timed(timings, name):
+            block = stage.flush()
+        block = run(block, stages[i + 1:])
+        if len(block):
+            yield block
@@ -0,0 +1,375 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+# Synthesis call settings (override with environment variables)
+# Seconds until the first audio bytes must arrive, between later bytes, and for a whole attempt
+FIRST_BYTE_TIMEOUT = float(os.getenv("TTS_FIRST_BYTE_TIMEOUT", "15"))
+IDLE_TIMEOUT = float(os.getenv("TTS_IDLE_TIMEOUT", "15"))
+CALL_TIMEOUT = float(os.getenv("TTS_CALL_TIMEOUT", "120"))
+# Retries per call, with full-jitter exponential backoff
+RETRIES = int(os.getenv("TTS_RETRIES", os.getenv("TTS_CHUNK_RETRIES", "2")))
+BACKOFF_BASE = float(os.getenv("TTS_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("TTS_BACKOFF_MAX", "8"))
+# Hedging: send a second request when the first byte is later than this latency percentile
+HEDGE_ENABLED = os.getenv("TTS_HEDGE", "1") != "0"
+HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("TTS_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("TTS_HEDGE_MIN_DELAY", "1.0"))
+# Circuit breaker: open after this many failed attempts in a row, probe again after BREAKER_RESET seconds
+BREAKER_FAILURES = int(os.getenv("TTS_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("TTS_BREAKER_RESET", "30"))
+
+
+class SynthesisError(Exception):
+    """A synthesis call failed after all retries"""
+
+
+class SynthesisTimeout(SynthesisError):
+    """The backend did not deliver audio in time"""
+
+
+class CircuitOpenError(SynthesisError):
+    """The backend is failing; calls are rejected without trying"""
+
+
+def _is_permanent(error):
+    """Errors a retry cannot fix: the backend answered, but rejected the request"""
+    if isinstance(error, ValueError):
+        return True
+    try:
+        from edge_tts.exceptions import NoAudioReceived
+    except ImportError:
+        return False
+    return isinstance(error, NoAudioReceived)
+
+
+class LatencyTracker:
+    """Recent time-to-first-byte samples, for the hedging threshold"""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """The q-quantile (0..1) of the recorded samples, or None if there are none"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the backend is down.
+
+    After `failures` failed attempts in a row the breaker opens and every
+    call is rejected for `reset` seconds. Then one probe attempt is let
+    through (half-open); it closes the breaker if it succeeds and reopens
+    it if not.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = "closed"
+        self.opened = 0
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            retry_in = self._opened_at + self.reset - time.monotonic()
+            if self.state == "open" and retry_in <= 0:
+                self.state = "half-open"
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(
+                f"Speech backend unavailable after {self._consecutive} failed attempts, "
+                f"retrying in {max(0, retry_in):.0f}s"
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            self.state = "closed"
+
+    def release(self):
+        """
+        Give back the probe slot of a call that was cancelled.
+
+        Cancellation says nothing about the backend, so it counts neither
+        as a success nor as a failure; the next call may probe instead.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == "half-open" or (self.state == "closed" and self._consecutive >= self.failures):
+                if self.state == "closed":
+                    print(f"⚠️ Circuit breaker open: {self._consecutive} synthesis attempts failed in a row")
+                self.state = "open"
+                self.opened += 1
+                self._opened_at = time.monotonic()
+
+
+class ResilientFetcher:
+    """
+    Run streaming backend calls with deadlines, retries, hedging and a circuit breaker.
+
+    Each attempt must deliver its first bytes within first_byte_timeout,
+    then new bytes at least every idle_timeout, and finish within
+    call_timeout. Failed attempts are retried after a random delay of up to
+    backoff_base * 2 ** attempt seconds (capped at backoff_max).
+
+    Once enough first-byte latencies have been seen, an attempt that is
+    slower than their hedge_percentile gets a duplicate request; whichever
+    answers first is used and the other is cancelled.
+    """
+
+    def __init__(self, first_byte_timeout=FIRST_BYTE_TIMEOUT, idle_timeout=IDLE_TIMEOUT,
+                 call_timeout=CALL_TIMEOUT, retries=RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, hedge=HEDGE_ENABLED, hedge_percentile=HEDGE_PERCENTILE,
+                 breaker=None):
+        self.first_byte_timeout = first_byte_timeout
+        self.idle_timeout = idle_timeout
+        self.call_timeout = call_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def hedge_delay(self):
+        """Seconds after which an attempt is hedged, or None"""
+        if not self.hedge or len(self.latency) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.latency.percentile(self.hedge_percentile))
+
+    async def fetch(self, open_stream, on_data=None, on_reset=None, on_event=None):
+        """
+        Read a stream to the end, retrying failed attempts.
+
+        Args:
+            open_stream (callable): Returns a new async iterator for each attempt,
+                yielding bytes (audio) and dicts (events such as word boundaries)
+            on_data (callable): Optional callback receiving each audio chunk as it arrives
+            on_reset (callable): Called before a retry if a failed attempt had
+                already passed audio or events on
+            on_event (callable): Optional callback receiving each event dict
+
+        Returns:
+            bytes: All audio the successful attempt delivered
+
+        Raises:
+            CircuitOpenError: The breaker is open
+            SynthesisError: All attempts failed
+        """
+        self._count("calls")
+        for attempt in range(self.retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+
+            delivered = False
+
+            def forward(data):
+                nonlocal delivered
+                delivered = True
+                if isinstance(data, dict):
+                    if on_event:
+                        on_event(data)
+                elif on_data:
+                    on_data(data)
+
+            self._count("attempts")
+            try:
+                data = await self._attempt(open_stream, forward)
+            except asyncio.CancelledError:
+                # e.g. parse_ssml_to_audio cancelling sibling fragments after one failed
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if _is_permanent(e):
+                    # The backend is up, it just refused this input
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                self._count("failures")
+                if isinstance(e, SynthesisTimeout):
+                    self._count("timeouts")
+                if delivered and on_reset:
+                    on_reset()
+                if attempt == self.retries:
+                    raise SynthesisError(f"Speech synthesis failed after {attempt + 1} attempts: {e}") from e
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                print(f"Synthesis attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                self._count("retries")
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return data
+
+    async def _attempt(self, open_stream, on_data):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.call_timeout
+        first_byte_at = min(started + self.first_byte_timeout, deadline)
+        hedge_delay = self.hedge_delay()
+        pending = {}  # first-chunk task -> stream
+        errors = []
+
+        def launch():
+            stream = open_stream().__aiter__()
+            pending[asyncio.ensure_future(stream.__anext__())] = stream
+            return stream
+
+        primary = launch()
+        winner = first = None
+        hedged = False
+        try:
+            # Wait for the first bytes, hedging once if they are late
+            while winner is None:
+                wait_until = first_byte_at
+                if hedge_delay is not None and not hedged:
+                    wait_until = min(wait_until, started + hedge_delay)
+                done, _ = await asyncio.wait(pending, timeout=max(0.0, wait_until - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = pending.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        errors.append(SynthesisError("Audio generation returned no data"))
+                        continue
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    winner = stream
+                    break
+                if winner is not None:
+                    break
+                if not pending:
+                    raise errors[-1]
+                if not done:
+                    if hedge_delay is not None and not hedged and loop.time() < first_byte_at:
+                        hedged = True
+                        self._count("hedges")
+                        launch()
+                    else:
+                        raise SynthesisTimeout(f"No audio after {self.first_byte_timeout:g}s")
+        finally:
+            await _discard(pending)
+
+        self.latency.record(loop.time() - started)
+        if winner is not primary:
+            self._count("hedge_wins")
+
+        audio = bytearray()
+
+        def take(data):
+            if not isinstance(data, dict):
+                audio.extend(data)
+            on_data(data)
+
+        take(first)
+        try:
+            while True:
+                timeout = min(self.idle_timeout, deadline - loop.time())
+                if timeout <= 0:
+                    raise SynthesisTimeout(f"Synthesis took longer than {self.call_timeout:g}s")
+                try:
+                    data = await asyncio.wait_for(winner.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise SynthesisTimeout(f"No audio for {timeout:.3g}s") from None
+                take(data)
+        finally:
+            await _close(winner)
+        return bytes(audio)
+
+    def stats(self):
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        with self._lock:
+            return dict(
+                self._stats,
+                breaker_state=self.breaker.state,
+                breaker_opened=self.breaker.opened,
+                first_byte_p50=round(p50, 3) if p50 is not None else None,
+                first_byte_p95=round(p95, 3) if p95 is not None else None,
+                hedge_delay=self.hedge_delay(),
+            )
+
+
+async def _close(stream):
+    try:
+        await stream.aclose()
+    except Exception:
+        pass
+
+
+async def _discard(pending):
+    """Cancel first-chunk tasks that lost (or were abandoned) and close their streams"""
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for stream in pending.values():
+        await _close(stream)
+
+
+_fetcher = None
+_fetcher_pid = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Return this process's ResilientFetcher (shared breaker and latency history)"""
+    global _fetcher, _fetcher_pid
+    with _fetcher_lock:
+        if _fetcher is None or _fetcher_pid != os.getpid():
+            _fetcher = ResilientFetcher()
+            _fetcher_pid = os.getpid()
+        return _fetcher
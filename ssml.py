@@ -2,7 +2,9 @@ import asyncio
 import argparse
 import os
 from pathlib import Path
-import edge_tts
+from ssml_parser import parse_ssml_to_audio
+from output_profiles import PROFILES, SAMPLE_RATES, export_segment, resolve_profile
+from backends import BACKEND, BACKENDS, use_backend
 
 # Define available voices with language grouping
 AVAILABLE_VOICES = [
@@ -30,9 +32,13 @@ AVAILABLE_VOICES = [
     {"id": "es-ES-ElviraNeural", "name": "Elvira (Female)", "language": "Spanish"}
 ]
 
-async def generate_speech_from_ssml(ssml_content, output_path, voice_id):
+async def generate_speech_from_ssml(ssml_content, output_path, voice_id, profile=None):
     """
     Generate speech from SSML content using Edge TTS
+
+    If profile (from output_profiles.resolve_profile) is given it sets the
+    codec, bitrate, channels and sample rate; otherwise the format follows
+    the output file extension.
     """
     # Ensure SSML content is properly formatted with correct namespace
     if not ssml_content.strip().startswith('<speak'):
@@ -42,17 +48,19 @@ async def generate_speech_from_ssml(ssml_content, output_path, voice_id):
             '<speak xmlns="http://www.w3.org/2001/10/synthesis" xmlns:mstts="http://www.w3.org/2001/mstts" version="1.0"')
     
     try:
-        # Make sure we're using SSML mode
-        # Use communicate_ssml method instead of Communicate if available
-        if hasattr(edge_tts, 'communicate_ssml'):
-            tts = edge_tts.communicate_ssml(ssml_content, voice_id,is_ssml=True)
+        # Fragments are streamed from edge-tts into memory and decoded from
+        # buffers; the only file written is the final output
+        audio = await parse_ssml_to_audio(ssml_content, voice_id)
+        if audio is None:
+            print("Error generating speech: invalid or empty SSML")
+            return None
+
+        if profile:
+            export_segment(audio, output_path, profile)
         else:
-            # Explicitly tell edge_tts this is SSML content
-            tts = edge_tts.Communicate(text=ssml_content, voice=voice_id, is_ssml=True)
-        
-        # Generate speech and save to file
-        await tts.save(output_path)
-        
+            output_format = Path(output_path).suffix.lstrip('.').lower() or 'mp3'
+            audio.export(output_path, format=output_format)
+
         print(f"Speech synthesized successfully and saved to '{output_path}'")
         return output_path
     except Exception as e:
@@ -83,9 +91,17 @@ async def main():
     parser.add_argument('-v', '--voice', type=str, default='en-US-JennyNeural', help='Voice ID to use')
     parser.add_argument('-l', '--list-voices', action='store_true', help='List available voices')
     parser.add_argument('-t', '--text', type=str, help='SSML text (alternative to input file)')
+    parser.add_argument('-p', '--profile', type=str, choices=sorted(PROFILES),
+                        help='Output profile (codec and bitrate); default: format from the output file extension')
+    parser.add_argument('--channels', type=int, choices=[1, 2], help='Force mono (1) or stereo (2)')
+    parser.add_argument('--sample-rate', type=int, choices=SAMPLE_RATES, help='Output sample rate in Hz')
+    parser.add_argument('--bitrate', type=str, help='Output bitrate, e.g. 48k')
+    parser.add_argument('-b', '--backend', type=str, choices=sorted(BACKENDS), default=BACKEND,
+                        help='Synthesis backend ("fake" produces silent audio offline, for testing)')
     
     # Parse arguments
     args = parser.parse_args()
+    use_backend(args.backend)
     
     # List voices if requested
     if args.list_voices:
@@ -108,12 +124,23 @@ async def main():
         parser.print_help()
         return
     
+    # Output profile, if any option asks for one
+    profile = None
+    if args.profile or args.channels or args.sample_rate or args.bitrate:
+        try:
+            profile = resolve_profile(args.profile, args.channels, args.sample_rate, args.bitrate)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    
     # Create output directory if it doesn't exist
     output_path = Path(args.output)
+    if profile and output_path.suffix.lstrip('.').lower() != profile['extension']:
+        output_path = output_path.with_suffix(f".{profile['extension']}")
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
     # Generate speech
-    await generate_speech_from_ssml(ssml_content, str(output_path), args.voice)
+    await generate_speech_from_ssml(ssml_content, str(output_path), args.voice, profile)
 
 if __name__ == "__main__":
     print("SSML Audio Generator (using Edge TTS)")
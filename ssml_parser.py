@@ -3,15 +3,69 @@ from xml.etree import ElementTree as ET
 from pydub import AudioSegment
 import asyncio
 import os
-import tempfile
-from edge_tts import Communicate
+import time
+from audio_assembly import concatenate_segments
+from dsp import stretch_segment
+from cpu_pool import run_cpu
+from synthesis import decode_audio, edge_rate, synthesize_to_bytes
+from metrics import timed
+from captions import shift_words
+
+# Maximum number of edge-tts requests in flight per SSML document
+FRAGMENT_CONCURRENCY = int(os.getenv("SSML_FRAGMENT_CONCURRENCY", "4"))
+# Consecutive fragments are merged into one edge-tts request of at most this many characters
+MAX_REQUEST_CHARS = int(os.getenv("SSML_MAX_REQUEST_CHARS", "3000"))
+# SSML is fed to the parser in pieces of this many characters
+FEED_CHARS = 16 * 1024
+
+# Paragraph and sentence elements: text merged across their boundaries needs a sentence break
+BLOCK_TAGS = ("p", "s")
+SENTENCE_END = ".!?…。！？"
+
+# Pause lengths for <break strength="..."> without a time
+BREAK_STRENGTHS = {"none": 0, "x-weak": 250, "weak": 500, "medium": 750, "strong": 1000, "x-strong": 1250}
+
+async def synthesize_fragment(text, voice_id="en-US-GuyNeural", timings=None, rate="+0%", words=None):
+    # Streamed into memory, then decoded from the buffer in the CPU stage - no temp files
+    timings = {} if timings is None else timings
+    with timed(timings, "synthesis"):
+        data = await synthesize_to_bytes(text, voice_id, rate, words=words)
+    with timed(timings, "decode"):
+        return await run_cpu(decode_audio, data)
+
+def _local_name(tag):
+    # <speak xmlns="http://www.w3.org/2001/10/synthesis"> parses as "{...}speak"
+    return tag.split("}", 1)[1] if tag.startswith("{") else tag
+
+def parse_prosody_rate(rate):
+    """
+    Convert an SSML prosody rate to a speed factor.
+
+    Accepts the named rates, relative percentages ("+20%", "-10%"),
+    absolute percentages ("120%") and plain multipliers ("1.5").
+    Unknown values fall back to 1.0.
+    """
+    named = {
+        "x-slow": 0.6,
+        "slow": 0.8,
+        "medium": 1.0,
+        "default": 1.0,
+        "fast": 1.2,
+        "x-fast": 1.5
+    }
+    rate = rate.strip()
+    if rate in named:
+        return named[rate]
+    try:
+        if rate.endswith("%"):
+            value = float(rate[:-1])
+            speed = 1.0 + value / 100 if rate[0] in "+-" else value / 100
+        else:
+            speed = float(rate)
+    except ValueError:
+        return 1.0
+    return speed if speed > 0 else 1.0
 
-async def synthesize_fragment(text, voice_id="en-US-GuyNeural"):
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, f"frag_{abs(hash(text))}.mp3")
-    communicate = Communicate(text.strip(), voice_id)
-    await communicate.save(file_path)
-    return AudioSegment.from_file(file_path)
 
 def parse_time_to_ms(time_str):
     if time_str.endswith("ms"):
@@ -20,47 +74,283 @@ def parse_time_to_ms(time_str):
         return int(float(time_str[:-1]) * 1000)
     return 0
 
-async def parse_ssml_to_audio(ssml_content, voice_id="en-US-GuyNeural"):
-    audio_segments = []
+def _break_ms(attrib):
+    if "time" in attrib:
+        try:
+            return parse_time_to_ms(attrib["time"].strip())
+        except ValueError:
+            # Malformed time (e.g. "1.5xs"): fall back to the strength, like a break without time
+            print(f"Ignoring invalid break time: {attrib['time']!r}")
+    return BREAK_STRENGTHS.get(attrib.get("strength"), 500)
 
-    try:
-        root = ET.fromstring(ssml_content)
-        assert root.tag == "speak"
-    except ET.ParseError:
-        print("Invalid SSML")
+
+def _child_context(tag, attrib, context):
+    """Rendering settings inside an element, given those of its parent"""
+    context = dict(context, tag=tag)
+    if tag == "prosody" and "rate" in attrib:
+        # Nested rates multiply: <prosody rate="fast"><prosody rate="fast"> is 1.2 * 1.2
+        context["speed"] = context["speed"] * parse_prosody_rate(attrib["rate"])
+    return context
+
+
+def iter_fragments(chunks):
+    """
+    Parse SSML incrementally and yield what to render, in document order.
+
+    The document is read with XMLPullParser, so fragments come out while the
+    rest is still being parsed, and elements are dropped from the tree as
+    soon as their text and tail have been used: memory stays bounded for
+    large documents. The whole tree is walked: text directly inside <speak>,
+    text after a child element (its tail) and nested elements all count.
+    Nested <prosody> rates multiply. "block" numbers the innermost <p> or
+    <s> a text fragment belongs to (0 outside of any).
+
+    Args:
+        chunks (iterable): The SSML document as a sequence of strings
+
+    Yields:
+        dict: {"kind": "text", "text", "speed", "tag", "block"} or {"kind": "break", "ms"}
+
+    Raises:
+        ET.ParseError: If the document is not well-formed or has no <speak> root
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root_context = {"speed": 1.0, "tag": "speak", "block": 0}
+    stack = []  # open elements: [element, context, last finished child]
+    blocks = 0
+
+    def text_fragment(text, context):
+        text = " ".join((text or "").split())
+        # Punctuation on its own (e.g. the "." after </emphasis>) has nothing to speak
+        if any(c.isalnum() for c in text):
+            return {"kind": "text", "text": text, "speed": context["speed"], "tag": context["tag"],
+                    "block": context["block"]}
         return None
 
-    async def process_element(elem):
-        if elem.tag == "break":
-            duration = parse_time_to_ms(elem.attrib.get("time", "500ms"))
-            return AudioSegment.silent(duration=duration)
-
-        elif elem.tag == "prosody":
-            rate = elem.attrib.get("rate", "medium")
-            inner_text = ''.join(elem.itertext()).strip()
-            speed = {
-                "x-slow": 0.6,
-                "slow": 0.8,
-                "medium": 1.0,
-                "fast": 1.2,
-                "x-fast": 1.5
-            }.get(rate, 1.0)
-            audio = await synthesize_fragment(inner_text, voice_id)
-            if speed != 1.0:
-                audio = audio._spawn(audio.raw_data, overrides={"frame_rate": int(audio.frame_rate * speed)}).set_frame_rate(audio.frame_rate)
-            return audio
-
-        elif elem.tag in {"emphasis", "say-as"}:
-            text = ''.join(elem.itertext()).strip()
-            return await synthesize_fragment(text, voice_id)
+    def flush_preceding(frame):
+        # The parent's text, or the tail of the previous child, is complete
+        # once the next child starts or the parent ends
+        elem, context, last_child = frame
+        if last_child is None:
+            fragment = text_fragment(elem.text, context)
+        else:
+            fragment = text_fragment(last_child.tail, context)
+            elem.remove(last_child)
+        return fragment
+
+    def handle(events):
+        nonlocal blocks
+        for event, elem in events:
+            tag = _local_name(elem.tag)
+            if event == "start":
+                if not stack:
+                    if tag != "speak":
+                        raise ET.ParseError(f"SSML root must be <speak>, not <{tag}>")
+                    stack.append([elem, root_context, None])
+                    continue
+                fragment = flush_preceding(stack[-1])
+                if fragment:
+                    yield fragment
+                stack[-1][2] = None
+                context = _child_context(tag, elem.attrib, stack[-1][1])
+                if tag in BLOCK_TAGS:
+                    blocks += 1
+                    context["block"] = blocks
+                stack.append([elem, context, None])
+            else:
+                frame = stack.pop()
+                if tag == "break":
+                    yield {"kind": "break", "ms": _break_ms(elem.attrib)}
+                else:
+                    fragment = flush_preceding(frame)
+                    if fragment:
+                        yield fragment
+                if stack:
+                    stack[-1][2] = elem
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from handle(parser.read_events())
+    parser.close()
+    yield from handle(parser.read_events())
+
+
+def plan_requests(fragments, max_chars=MAX_REQUEST_CHARS):
+    """
+    Merge consecutive fragments into as few backend requests as possible.
 
+    edge-tts takes plain text and a single rate per request (custom SSML is
+    escaped), so text fragments are merged as long as they share a speed:
+    paragraphs, sentences and <emphasis> next to each other become one
+    request. A run is closed only where the document needs local work - a
+    <break> (rendered as silence) or a change of speed - or when it would
+    exceed max_chars. Adjacent breaks are merged into one pause and breaks
+    of 0 ms do not split a run. Where a merge crosses a <p> or <s> boundary
+    and the text so far has no sentence-ending punctuation, a full stop is
+    added so the voice still pauses there ("Title" + "Body" is spoken as
+    "Title. Body").
+
+    Args:
+        fragments (iterable): Fragments from iter_fragments
+        max_chars (int): Longest merged text (a single longer fragment is sent as is)
+
+    Yields:
+        dict: {"kind": "text", "text", "speed", "tags", "fragments"} or {"kind": "break", "ms"}
+    """
+    run = None
+    pause = 0
+    for fragment in fragments:
+        if fragment["kind"] == "break":
+            if fragment["ms"] <= 0:
+                continue
+            if run:
+                yield run
+                run = None
+            pause += fragment["ms"]
+            continue
+
+        if pause:
+            yield {"kind": "break", "ms": pause}
+            pause = 0
+        if run and run["speed"] == fragment["speed"] and len(run["text"]) + len(fragment["text"]) < max_chars:
+            if fragment.get("block") != run["block"] and run["text"][-1] not in SENTENCE_END:
+                run["text"] += "."
+            run["text"] += " " + fragment["text"]
+            run["block"] = fragment.get("block")
+            run["fragments"] += 1
+            if fragment["tag"] not in run["tags"]:
+                run["tags"].append(fragment["tag"])
         else:
-            text = ''.join(elem.itertext()).strip()
-            return await synthesize_fragment(text, voice_id)
+            if run:
+                yield run
+            run = {"kind": "text", "text": fragment["text"], "speed": fragment["speed"],
+                   "tags": [fragment["tag"]], "block": fragment.get("block"), "fragments": 1}
+    if run:
+        yield run
+    if pause:
+        yield {"kind": "break", "ms": pause}
+
+
+def _native_speed(rate):
+    # "+44%" -> 1.44
+    return 1.0 + int(rate[:-1]) / 100
+
+
+def _chunks(text, size=FEED_CHARS):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+async def parse_ssml_to_audio(ssml_content, voice_id="en-US-GuyNeural", concurrency=FRAGMENT_CONCURRENCY, timings=None, progress=None,
+                              words=None):
+    """
+    Render an SSML document to a single AudioSegment.
+
+    The document is parsed incrementally (see iter_fragments) and merged
+    into requests (see plan_requests); each request starts synthesizing as
+    soon as it is complete, so large documents do not wait for the whole
+    parse. Prosody rates are sent to edge-tts as its native rate, and only
+    the part it cannot produce is time-stretched locally. Requests are
+    synthesized concurrently (at most `concurrency` edge-tts requests at a
+    time) and reassembled in document order. Breaks are rendered locally
+    and never wait for a network slot.
+
+    Args:
+        ssml_content (str): SSML markup with a <speak> root
+        voice_id (str): Voice ID to use
+        concurrency (int): Maximum number of concurrent edge-tts requests
+        timings (list): Optional list that receives one timing dict per request
+            (wait, synthesis, decode and speedup seconds)
+        progress (callable): Optional progress(done, total) callback, called as
+            requests and breaks finish; total grows while the document is being parsed
+        words (list): Optional list that receives the word timings of the
+            rendered audio (see captions.shift_words), from the same requests
+
+    Returns:
+        AudioSegment or None if the SSML is invalid or empty
+    """
+    concurrency = max(1, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    fragment_timings = []
+    request_words = {}  # task index -> word timings within that request's audio
+
+    async def synthesize(index, request):
+        rate = edge_rate(request["speed"])
+        # edge-tts rates are whole percent: smaller differences are not worth a stretch
+        factor = request["speed"] / _native_speed(rate)
+        queued = time.perf_counter()
+        stages = {}
+        spoken = [] if words is not None else None
+        async with semaphore:
+            started = time.perf_counter()
+            audio = await synthesize_fragment(request["text"], voice_id, stages, rate, spoken)
+        # Pitch-preserving tempo change (see dsp.time_stretch) for speeds edge-tts cannot reach
+        if abs(factor - 1.0) >= 0.01:
+            with timed(stages, "speedup"):
+                audio = await run_cpu(stretch_segment, audio, factor)
+        else:
+            factor = 1.0
+        if spoken is not None:
+            request_words[index] = shift_words(spoken, factor=factor)
+        fragment_timings.append({
+            "index": index,
+            "tags": request["tags"],
+            "fragments": request["fragments"],
+            "rate": rate,
+            "chars": len(request["text"]),
+            "wait_seconds": round(started - queued, 3),
+            **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in stages.items()},
+        })
+        return audio
+
+    done = 0
+    tasks = []
+
+    async def render(index, request):
+        nonlocal done
+        if request["kind"] == "break":
+            audio = AudioSegment.silent(duration=request["ms"])
+        else:
+            audio = await synthesize(index, request)
+        done += 1
+        if progress:
+            progress(done, len(tasks))
+        return audio
+
+    started = time.perf_counter()
+    try:
+        for request in plan_requests(iter_fragments(_chunks(ssml_content))):
+            tasks.append(asyncio.ensure_future(render(len(tasks), request)))
+            if len(tasks) % concurrency == 0:
+                await asyncio.sleep(0)  # let the first requests go out while parsing continues
+    except (ET.ParseError, ValueError) as e:
+        print(f"Invalid SSML: {e}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return None
+
+    try:
+        audio_segments = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if words is not None:
+        # Each request's words start where its audio starts in the joined output
+        offset = 0.0
+        for index, audio in enumerate(audio_segments):
+            words.extend(shift_words(request_words.get(index, []), offset=offset))
+            offset += audio.frame_count() / audio.frame_rate if audio else 0.0
 
-    for node in root:
-        seg = await process_element(node)
-        if seg:
-            audio_segments.append(seg)
+    fragment_timings.sort(key=lambda t: t["index"])
+    if fragment_timings:
+        slowest = max(fragment_timings, key=lambda t: t["synthesis_seconds"])
+        fragments = sum(t["fragments"] for t in fragment_timings)
+        print(f"SSML: {fragments} fragments as {len(fragment_timings)} requests in {time.perf_counter() - started:.2f}s "
+              f"(concurrency={concurrency}, slowest #{slowest['index']} {slowest['synthesis_seconds']}s)")
+    if timings is not None:
+        timings.extend(fragment_timings)
 
-    return sum(audio_segments) if audio_segments else None
\ No newline at end of file
+    return concatenate_segments(audio_segments)
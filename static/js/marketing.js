@@ -49,44 +49,38 @@ document.addEventListener('DOMContentLoaded', function() {
         // Get form data
         const formData = new FormData(marketingForm);
         
-        // AJAX request to generate script
-        fetch('/generate-marketing-script', {
-            method: 'POST',
-            body: formData
+        // Stream the script into the output box as it is generated
+        streamScript('/generate-marketing-script', formData, text => {
+            loadingSpinner.style.display = 'none';
+            scriptOutput.innerHTML = formatScriptOutput(text);
+            outputContainer.style.display = 'block';
         })
-        .then(response => response.json())
-        .then(data => {
+        .then(script => {
             // Hide loading spinner
             loadingSpinner.style.display = 'none';
             
-            if (data.success) {
-                // Display the script
-                scriptOutput.innerHTML = formatScriptOutput(data.script);
-                
-                // Show output container
-                outputContainer.style.display = 'block';
-                
-                // Populate hidden field for TTS
-                document.getElementById('text-content').value = data.script;
-                
-                // Scroll to the output
-                outputContainer.scrollIntoView({ behavior: 'smooth' });
-                
-                // Save to local history
-                saveToScriptHistory(formData, data.script);
-                
-                // Add emotional tone analysis
-                analyzeEmotionalTone(data.script);
-            } else {
-                // Show error
-                scriptOutput.innerHTML = `<div class="alert alert-danger">${data.error || 'An error occurred while generating the script.'}</div>`;
-                outputContainer.style.display = 'block';
-            }
+            // Display the script
+            scriptOutput.innerHTML = formatScriptOutput(script);
+            
+            // Show output container
+            outputContainer.style.display = 'block';
+            
+            // Populate hidden field for TTS
+            document.getElementById('text-content').value = script;
+            
+            // Scroll to the output
+            outputContainer.scrollIntoView({ behavior: 'smooth' });
+            
+            // Save to local history
+            saveToScriptHistory(formData, script);
+            
+            // Add emotional tone analysis
+            analyzeEmotionalTone(script);
         })
         .catch(error => {
             console.error('Error:', error);
             loadingSpinner.style.display = 'none';
-            scriptOutput.innerHTML = '<div class="alert alert-danger">An error occurred while generating the script. Please try again.</div>';
+            scriptOutput.innerHTML = `<div class="alert alert-danger">${error.message || 'An error occurred while generating the script. Please try again.'}</div>`;
             outputContainer.style.display = 'block';
         });
     });
@@ -0,0 +1,76 @@
+// script_stream.js - Read a generated script as it is written
+
+/**
+ * POST formData to a script generation route and read the answer as
+ * server-sent events, calling onText(textSoFar) for every new chunk.
+ *
+ * Resolves with the full script, rejects with an Error carrying the
+ * server's message.
+ */
+function streamScript(url, formData, onText) {
+    formData.append('stream', '1');
+
+    return fetch(url, {
+        method: 'POST',
+        body: formData,
+        headers: { 'Accept': 'text/event-stream' }
+    }).then(response => {
+        const type = response.headers.get('Content-Type') || '';
+        if (!type.startsWith('text/event-stream')) {
+            // Validation errors still come back as JSON
+            return response.json().then(data => {
+                if (data.error) throw new Error(data.error);
+                if (onText) onText(data.script);
+                return data.script;
+            });
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let script = '';
+
+        function handleEvent(raw) {
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) return null;
+
+            const payload = JSON.parse(data);
+            if (event === 'chunk') {
+                script += payload.text;
+                if (onText) onText(script);
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            } else if (event === 'done') {
+                return payload.script;
+            }
+            return null;
+        }
+
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                let index;
+                while ((index = buffer.indexOf('\n\n')) !== -1) {
+                    const raw = buffer.slice(0, index);
+                    buffer = buffer.slice(index + 2);
+                    const finished = handleEvent(raw);
+                    if (finished !== null) {
+                        reader.cancel();
+                        return finished;
+                    }
+                }
+                if (done) {
+                    throw new Error('The connection closed before the script was complete.');
+                }
+                return read();
+            });
+        }
+
+        return read();
+    });
+}
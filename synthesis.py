@@ -0,0 +1,86 @@
+import io
+from pydub import AudioSegment
+from backends import get_backend
+from output_profiles import SOURCE_FORMAT
+from resilience import get_fetcher
+
+# Speed range edge-tts can produce natively; the rest is time-stretched
+EDGE_MIN_SPEED = 0.5
+EDGE_MAX_SPEED = 2.0
+
+
+def edge_speed(speed):
+    """Clamp a speed factor to the range edge-tts supports"""
+    return min(EDGE_MAX_SPEED, max(EDGE_MIN_SPEED, speed))
+
+
+def edge_rate(speed):
+    """
+    Convert a speed factor (1.0 = normal) to an edge-tts rate string.
+
+    Example: 1.25 -> "+25%", 0.8 -> "-20%"
+    Speeds outside EDGE_MIN_SPEED..EDGE_MAX_SPEED are clamped.
+    """
+    return f"{round((edge_speed(speed) - 1.0) * 100):+d}%"
+
+
+def source_seconds(data):
+    """Playback length of synthesized MP3 data (constant bitrate, see SOURCE_FORMAT)"""
+    return len(data) * 8 / (SOURCE_FORMAT["bitrate_kbps"] * 1000)
+
+
+def stream_audio(text, voice_id, rate="+0%", boundaries=False):
+    """
+    Async iterator of MP3 data from the synthesis backend (edge-tts unless
+    TTS_BACKEND says otherwise, see backends.py) as it arrives, with word
+    boundary dicts in between if boundaries is True
+    """
+    return get_backend().stream(text, voice_id, rate, boundaries)
+
+
+async def synthesize_to_bytes(text, voice_id, rate="+0%", on_data=None, on_reset=None, words=None):
+    """
+    Synthesize text with the synthesis backend and collect the MP3 stream in memory.
+
+    Nothing is written to disk: audio chunks from the backend's stream
+    (Communicate.stream() for edge-tts) are appended to a buffer as they
+    arrive. Calls have deadlines and are retried, hedged and circuit-broken by
+    the process's ResilientFetcher (see resilience.py).
+
+    Args:
+        text (str): Plain text to speak
+        voice_id (str): Voice ID to use (compatible with edge-tts)
+        rate (str): edge-tts rate, e.g. "+10%"
+        on_data (callable): Optional callback receiving each chunk as it arrives
+        on_reset (callable): Optional callback run before a retry when a failed
+            attempt had already passed chunks to on_data
+        words (list): Optional list that receives the word timings of the
+            audio ({"start", "end", "text"}, seconds), from the same request
+
+    Returns:
+        bytes: MP3 data
+
+    Raises:
+        SynthesisError: edge-tts failed on every attempt, or the circuit breaker is open
+    """
+    if words is None:
+        return await get_fetcher().fetch(lambda: stream_audio(text, voice_id, rate), on_data, on_reset)
+
+    def reset():
+        # The retry reports its words from the start again
+        words.clear()
+        if on_reset:
+            on_reset()
+
+    return await get_fetcher().fetch(lambda: stream_audio(text, voice_id, rate, boundaries=True),
+                                     on_data, reset, on_event=words.append)
+
+
+def decode_audio(data, format="mp3"):
+    """Decode encoded audio bytes to an AudioSegment through an ffmpeg pipe"""
+    return AudioSegment.from_file(io.BytesIO(data), format=format)
+
+
+async def synthesize_to_segment(text, voice_id, rate="+0%"):
+    """Synthesize text and return it decoded as an AudioSegment"""
+    return decode_audio(await synthesize_to_bytes(text, voice_id, rate))
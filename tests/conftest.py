@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# Offline settings, read by the modules at import time: fake speech backend,
+# CPU stage in the calling thread, cache and metrics in a throwaway directory
+_work_dir = tempfile.mkdtemp(prefix="tts_tests_")
+os.environ.setdefault("TTS_BACKEND", "fake")
+os.environ.setdefault("TTS_FAKE_LATENCY", "0")
+os.environ.setdefault("TTS_FAKE_JITTER", "0")
+os.environ.setdefault("TTS_FAKE_REALTIME", "0")
+os.environ.setdefault("TTS_CPU_WORKERS", "0")
+os.environ.setdefault("TTS_CACHE_DIR", os.path.join(_work_dir, "cache"))
+os.environ.setdefault("TTS_METRICS_DIR", os.path.join(_work_dir, "metrics"))
+os.environ.setdefault("TTS_JANITOR", "0")
+os.environ.setdefault("JOB_STORE", "memory")
+
+# The application modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
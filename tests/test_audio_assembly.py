@@ -0,0 +1,35 @@
+import numpy as np
+from pydub import AudioSegment
+
+from audio_assembly import concatenate_segments, normalize_segments
+
+
+def tone(ms, frame_rate=24000, channels=1, seed=0):
+    samples = np.random.default_rng(seed).integers(-3000, 3000, frame_rate * ms // 1000 * channels, dtype=np.int16)
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+
+
+def test_matches_summing_segments():
+    segments = [tone(100 + i * 10, seed=i) for i in range(5)]
+
+    joined = concatenate_segments(segments)
+
+    assert joined.raw_data == sum(segments[1:], segments[0]).raw_data
+
+
+def test_normalizes_to_the_highest_format():
+    segments = [tone(100, frame_rate=24000), tone(100, frame_rate=48000, channels=2, seed=1)]
+
+    joined = concatenate_segments(segments)
+    normalized = normalize_segments(segments)
+
+    assert (joined.frame_rate, joined.channels) == (48000, 2)
+    assert all((s.frame_rate, s.channels) == (48000, 2) for s in normalized)
+    assert normalized[1] is segments[1]
+    assert abs(len(joined) - 200) <= 1
+
+
+def test_skips_missing_segments():
+    assert concatenate_segments([]) is None
+    assert concatenate_segments([None, AudioSegment.empty()]) is None
+    assert len(concatenate_segments([None, tone(50), AudioSegment.empty(), tone(50, seed=2)])) == 100
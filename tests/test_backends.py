@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from backends import FakeBackend, use_backend
+
+
+def collect(backend, text, rate="+0%", boundaries=False):
+    async def run():
+        return [item async for item in backend.stream(text, "en-US-GuyNeural", rate, boundaries)]
+    return asyncio.run(run())
+
+
+def fake(**kwargs):
+    options = dict(latency=0.0, jitter=0.0, realtime=0.0, seed=1)
+    options.update(kwargs)
+    return FakeBackend(**options)
+
+
+def test_audio_length_depends_only_on_text_and_rate():
+    backend = fake()
+    audio = b"".join(collect(backend, "Hello there, this is a test."))
+    frames = round(backend.duration("Hello there, this is a test.") / FakeBackend.FRAME_SECONDS)
+
+    assert len(audio) == frames * len(FakeBackend.FRAME)
+    assert audio == b"".join(collect(fake(seed=2), "Hello there, this is a test."))
+    assert len(b"".join(collect(backend, "Hello there, this is a test.", rate="+100%"))) < len(audio)
+
+
+def test_word_boundaries_come_before_their_audio():
+    items = collect(fake(), "one two three four five six seven eight nine ten eleven twelve", boundaries=True)
+    words = [item for item in items if isinstance(item, dict)]
+
+    assert [w["text"] for w in words][:3] == ["one", "two", "three"]
+    assert len(words) == 12
+    assert all(a["end"] <= b["start"] for a, b in zip(words, words[1:]))
+    assert isinstance(items[0], dict)
+
+
+@pytest.mark.parametrize("text", ["Hi.", "A short sentence.", "A somewhat longer sentence to speak. " * 4])
+def test_a_drawn_failure_always_fires(text):
+    backend = fake(failure_rate=1.0, seed=None)
+    for _ in range(200):
+        with pytest.raises(ConnectionError):
+            collect(backend, text)
+
+
+def test_failure_rate_is_honoured():
+    backend = fake(failure_rate=0.2, seed=7)
+    failures = 0
+    for _ in range(1000):
+        try:
+            collect(backend, "Hi.")
+        except ConnectionError:
+            failures += 1
+
+    assert 150 < failures < 250
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown synthesis backend"):
+        use_backend("nope")
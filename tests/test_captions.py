@@ -0,0 +1,50 @@
+from captions import build_cues, format_srt, format_vtt, shift_words, write_captions
+
+
+def words(*items):
+    return [{"start": start, "end": end, "text": text} for start, end, text in items]
+
+
+def test_shift_words_maps_onto_the_output_timeline():
+    shifted = shift_words(words((1.0, 2.0, "Hi")), offset=10.0, factor=2.0)
+
+    assert shifted == [{"start": 10.5, "end": 11.0, "text": "Hi"}]
+
+
+def test_cues_split_on_length_duration_and_pauses():
+    cues = build_cues(words(
+        (0.0, 0.4, "Hello"), (0.5, 0.9, "there"), (0.9, 0.95, ","),
+        (2.0, 2.4, "after"), (2.5, 2.9, "pause"),
+    ), max_chars=42, max_seconds=5, max_gap=0.6)
+
+    assert cues == [(0.0, 0.95, "Hello there,"), (2.0, 2.9, "after pause")]
+    assert len(build_cues(words(*[(i, i + 0.5, "word") for i in range(4)]), max_chars=10)) == 2
+    assert len(build_cues(words(*[(i * 0.5, i * 0.5 + 0.4, "w") for i in range(10)]), max_seconds=2)) == 3
+
+
+def test_srt_and_vtt_timestamps():
+    cues = [(0.0, 1.5, "One"), (3661.2345, 3662.0, "Two")]
+
+    assert format_srt(cues) == (
+        "1\n00:00:00,000 --> 00:00:01,500\nOne\n"
+        "\n"
+        "2\n01:01:01,234 --> 01:01:02,000\nTwo\n"
+    )
+    assert format_vtt(cues) == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:01.500\nOne\n"
+        "\n"
+        "01:01:01.234 --> 01:01:02.000\nTwo\n"
+    )
+
+
+def test_negative_times_are_clamped():
+    assert "00:00:00,000 --> 00:00:00,500" in format_srt([(-0.2, 0.5, "Early")])
+
+
+def test_write_captions_next_to_the_audio(tmp_path):
+    audio = tmp_path / "voice.ogg"
+    result = write_captions(words((0.0, 0.4, "Hi"), (0.5, 0.9, "there")), str(audio))
+
+    assert result == {"srt": str(tmp_path / "voice.srt"), "vtt": str(tmp_path / "voice.vtt"), "cues": 1}
+    assert (tmp_path / "voice.vtt").read_text(encoding="utf-8").startswith("WEBVTT\n\n00:00:00.000")
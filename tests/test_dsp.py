@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.effects import low_pass_filter
+
+from dsp import (
+    DepthFilter, FadeEnvelope, TimeStretcher, apply_depth, depth_effect, segment_to_array, stretch_segment,
+    time_stretch,
+)
+
+
+def make_signal(seconds, frame_rate=24000, channels=1):
+    """A few harmonics with a slow envelope and some noise, like speech"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 560, 1120, 3300)))
+    signal = 6000 * voice * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) + 500 * rng.standard_normal(len(t))
+    samples = np.repeat(signal[:, None], channels, axis=1).astype(np.int16)
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+
+
+def pydub_depth(audio, depth):
+    """The depth chain tts.py ran before dsp.py"""
+    audio = low_pass_filter(audio, 18000 - (depth * 3000))
+    bass = audio.low_pass_filter(300) + (depth - 1) * 3
+    audio = audio.overlay(bass)
+    fade = min(200, len(audio) // 20)
+    return audio.fade_in(fade).fade_out(fade)
+
+
+@pytest.mark.parametrize("seconds, channels, depth", [(0.5, 1, 2), (1.0, 2, 3), (5.0, 1, 5)])
+def test_depth_matches_the_pydub_chain(seconds, channels, depth):
+    # 0.5 s and 1 s have fades under 100 ms (per-sample steps), 5 s the full 200 ms (per-ms steps)
+    audio = make_signal(seconds, channels=channels)
+
+    expected = segment_to_array(pydub_depth(audio, depth)).astype(np.int32)
+    actual = segment_to_array(depth_effect(audio, depth)).astype(np.int32)
+
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() <= 2
+
+
+def test_depth_one_is_a_no_op():
+    audio = make_signal(0.2)
+    assert depth_effect(audio, 1) is audio
+
+
+def test_block_size_does_not_change_the_result():
+    samples = segment_to_array(make_signal(3.0))
+
+    assert np.array_equal(apply_depth(samples, 24000, 3, block_frames=1000), apply_depth(samples, 24000, 3))
+
+
+@pytest.mark.parametrize("seconds", [0.3, 6.0])
+def test_streaming_filter_and_fades_match_one_pass(seconds):
+    samples = segment_to_array(make_signal(seconds))
+    depth_filter, envelope = DepthFilter(24000, 3), FadeEnvelope(24000)
+
+    blocks = [envelope.process(depth_filter.process(samples[i:i + 5000])) for i in range(0, len(samples), 5000)]
+    streamed = np.concatenate(blocks + [envelope.flush()])
+
+    assert np.array_equal(streamed, apply_depth(samples, 24000, 3))
+
+
+@pytest.mark.parametrize("rate", [0.8, 1.15, 1.5])
+@pytest.mark.parametrize("channels", [1, 2])
+def test_stretched_length(rate, channels):
+    samples = segment_to_array(make_signal(1.3, channels=channels))
+
+    stretched = time_stretch(samples, 24000, rate)
+
+    assert stretched.shape == (round(len(samples) / rate), channels)
+    assert stretched.dtype == samples.dtype
+
+
+def test_stretch_keeps_the_pitch():
+    t = np.arange(48000) / 24000
+    samples = (8000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)[:, None]
+
+    stretched = time_stretch(samples, 24000, 1.25)[:, 0].astype(float)
+
+    spectrum = np.abs(np.fft.rfft(stretched * np.hanning(len(stretched))))
+    assert abs(np.argmax(spectrum) * 24000 / len(stretched) - 440) < 5
+
+
+@pytest.mark.parametrize("block", [1, 777, 24000])
+def test_streamed_stretch_matches_one_pass(block):
+    samples = segment_to_array(make_signal(1.0, channels=2))
+    stretcher = TimeStretcher(24000, 2, 1.3)
+
+    blocks = [stretcher.process(samples[i:i + block]) for i in range(0, len(samples), block)]
+    streamed = np.concatenate(blocks + [stretcher.flush()])
+
+    assert np.array_equal(streamed, time_stretch(samples, 24000, 1.3))
+
+
+def test_unit_rate_and_empty_input_are_copies():
+    samples = segment_to_array(make_signal(0.2))
+    audio = make_signal(0.2)
+
+    same = time_stretch(samples, 24000, 1.0)
+    assert np.array_equal(same, samples) and same is not samples
+    assert len(time_stretch(samples[:0], 24000, 1.5)) == 0
+    assert stretch_segment(audio, 1.0) is audio
+
+
+@pytest.mark.parametrize("rate", [0, -1.0])
+def test_invalid_rate(rate):
+    samples = segment_to_array(make_signal(0.1))
+
+    with pytest.raises(ValueError):
+        time_stretch(samples, 24000, rate)
+    with pytest.raises(ValueError):
+        TimeStretcher(24000, 1, rate)
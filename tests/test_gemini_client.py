@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from gemini_client import FakeModel, ScriptClient, TTLCache
+
+
+def test_cache_expires_and_evicts_least_recently_used(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert "b" not in cache and "a" in cache
+
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache(ttl=0)
+    cache.put("a", "A")
+
+    assert cache.get("a") is None
+
+
+def test_fake_model_is_deterministic_and_streams_the_same_text():
+    model = FakeModel(delay=0)
+
+    text = model.generate_content("A podcast about bees").text
+    streamed = "".join(chunk.text for chunk in model.generate_content("A podcast about bees", stream=True))
+
+    assert text == streamed
+    assert "bees" in text
+    assert text != model.generate_content("A podcast about ants").text
+
+
+class CountingModel(FakeModel):
+    def __init__(self):
+        super().__init__(delay=0)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        return super().generate_content(prompt, stream)
+
+
+def test_client_caches_generate_and_stream():
+    client = ScriptClient(fake=True, cache=TTLCache(ttl=60))
+    client._model = model = CountingModel()
+
+    first = client.generate("Topic")
+    assert client.generate("Topic") == first
+    assert client.is_cached("Topic")
+
+    pieces = list(client.stream("Other topic"))
+    assert len(pieces) > 1
+    assert list(client.stream("Other topic")) == ["".join(pieces)]
+    assert model.calls == 2
+
+
+def test_failed_stream_is_not_cached():
+    class Broken(FakeModel):
+        def _stream(self, prompt):
+            yield self._Chunk("partial")
+            raise RuntimeError("stream dropped")
+
+    client = ScriptClient(fake=True, cache=TTLCache(ttl=60))
+    client._model = Broken(delay=0)
+
+    pieces = []
+    with pytest.raises(RuntimeError):
+        for piece in client.stream("Topic"):
+            pieces.append(piece)
+
+    assert pieces == ["partial"]
+    assert not client.is_cached("Topic")
@@ -0,0 +1,68 @@
+import os
+import time
+import fcntl
+
+import janitor
+from janitor import Janitor
+from job_store import MemoryJobStore
+
+
+def make_file(directory, name, size, age):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_removes_expired_files(tmp_path):
+    old = make_file(tmp_path, "old.mp3", 10, age=7200)
+    new = make_file(tmp_path, "new.mp3", 10, age=600)
+    (tmp_path / "cache").mkdir()
+
+    result = Janitor([tmp_path], ttl=3600, max_bytes=10 ** 6, min_age=300).sweep()
+
+    assert result == {"files": 1, "bytes": 10}
+    assert not old.exists() and new.exists()
+    assert (tmp_path / "cache").is_dir()
+
+
+def test_evicts_oldest_files_over_quota(tmp_path):
+    paths = [make_file(tmp_path, f"{i}.mp3", 100, age=4000 - i * 1000) for i in range(4)]
+    cleaner = Janitor([tmp_path], ttl=10 ** 6, max_bytes=250, min_age=300)
+
+    cleaner.sweep()
+
+    assert [p.exists() for p in paths] == [False, False, True, True]
+    assert cleaner.stats()["quota_files"] == 2
+    assert cleaner.stats()["bytes"] == 200
+
+
+def test_keeps_files_of_active_jobs_and_recent_files(tmp_path):
+    store = MemoryJobStore()
+    script = make_file(tmp_path, "script.txt", 100, age=7200)
+    store.create("a", {"status": "processing", "script_file": str(script)})
+    done = make_file(tmp_path, "done.txt", 100, age=7200)
+    store.create("b", {"status": "completed", "script_file": str(done)})
+    recent = make_file(tmp_path, "recent.txt", 100, age=10)
+
+    Janitor([tmp_path], store, ttl=3600, max_bytes=0, min_age=300).sweep()
+
+    assert script.exists() and recent.exists()
+    assert not done.exists()
+
+
+def test_only_one_process_sweeps_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(janitor, "TEMP_DIR", str(tmp_path / "tmp"))
+    old = make_file(tmp_path, "old.mp3", 10, age=7200)
+    cleaner = Janitor([tmp_path], ttl=3600, min_age=300)
+    cleaner.stop()  # one pass per _run()
+
+    os.makedirs(janitor.TEMP_DIR)
+    with open(os.path.join(janitor.TEMP_DIR, ".janitor.lock"), "w") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        cleaner._run()
+    assert cleaner.stats()["runs"] == 0 and old.exists()
+
+    cleaner._run()
+    assert cleaner.stats()["runs"] == 1 and not old.exists()
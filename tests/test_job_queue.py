@@ -0,0 +1,98 @@
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+import cpu_pool
+from cpu_pool import CPUStage, run_cpu
+from job_queue import JobExecutor, QueueFull
+
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(loops=1, max_concurrent=2, queue_size=10)
+    executor.start()
+    yield executor
+    executor.shutdown(timeout=5)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_runs_jobs_with_queue_wait(executor):
+    results = []
+
+    async def job(value, queue_wait):
+        await asyncio.sleep(0)
+        results.append((value, queue_wait))
+
+    for value in range(5):
+        executor.submit(job, value)
+    wait_for(lambda: len(results) == 5)
+
+    assert sorted(value for value, _ in results) == list(range(5))
+    assert all(queue_wait >= 0 for _, queue_wait in results)
+
+
+def test_limits_concurrency_and_rejects_when_full():
+    executor = JobExecutor(loops=1, max_concurrent=1, queue_size=1)
+    executor.start()
+    release = threading.Event()
+
+    async def blocked(queue_wait):
+        await asyncio.to_thread(release.wait)
+
+    try:
+        executor.submit(blocked)
+        wait_for(lambda: executor.active == 1)
+        assert executor.submit(blocked) == 0
+        assert executor.queue_depth() == 1
+        with pytest.raises(QueueFull):
+            executor.submit(blocked)
+    finally:
+        release.set()
+        executor.shutdown(timeout=5)
+
+
+def test_job_errors_do_not_stop_the_loop(executor):
+    done = []
+
+    async def failing(queue_wait):
+        raise RuntimeError("boom")
+
+    async def ok(queue_wait):
+        done.append(True)
+
+    executor.submit(failing)
+    executor.submit(ok)
+    wait_for(lambda: done)
+
+
+def test_shutdown_drains_queued_jobs_through_the_cpu_pool(monkeypatch):
+    # A real process pool: queued jobs must still reach it while the executor drains
+    stage = CPUStage(workers=2)
+    monkeypatch.setattr(cpu_pool, "_stage", stage)
+    monkeypatch.setattr(cpu_pool, "_stage_pid", os.getpid())
+    executor = JobExecutor(loops=1, max_concurrent=2, queue_size=20)
+    executor.start()
+    finished = []
+
+    async def job(value, queue_wait):
+        finished.append(await run_cpu(pow, value, 2))
+        await run_cpu(time.sleep, 0.05)
+
+    for value in range(8):
+        executor.submit(job, value)
+    executor.shutdown(timeout=30)
+
+    assert sorted(finished) == [value ** 2 for value in range(8)]
+    assert executor.active == 0
+    assert cpu_pool._stage is None
+    with pytest.raises(QueueFull):
+        executor.submit(job, 9)
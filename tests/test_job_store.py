@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+from job_store import JOB_STORE_PATH, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_store_create_get_update(store):
+    store.create("a", {"status": "queued", "progress": 0, "start_time": 100.0}, owner="alice")
+    created = store.updated_at("a")
+
+    time.sleep(0.01)
+    store.update("a", status="processing", progress=40)
+    job = store.get("a")
+
+    assert job["status"] == "processing"
+    assert job["progress"] == 40
+    assert job["start_time"] == 100.0
+    assert store.updated_at("a") > created
+    assert store.get("missing") is None
+    assert store.updated_at("missing") is None
+
+
+def test_store_list_filters_and_order(store):
+    store.create("old", {"status": "completed", "start_time": 1.0}, owner="alice")
+    store.create("new", {"status": "processing", "start_time": 3.0}, owner="alice")
+    store.create("other", {"status": "completed", "start_time": 2.0}, owner="bob")
+
+    assert list(store.list_jobs()) == ["new", "other", "old"]
+    assert list(store.list_jobs(owner="alice")) == ["new", "old"]
+    assert list(store.list_jobs(since=2.0)) == ["new", "other"]
+    assert list(store.list_jobs(status="completed")) == ["other", "old"]
+    assert list(store.list_jobs(status=("processing", "queued"))) == ["new"]
+    assert list(store.list_jobs(limit=1)) == ["new"]
+
+
+def test_store_delete(store):
+    store.create("a", {"status": "completed", "start_time": 1.0})
+    store.delete("a")
+
+    assert store.get("a") is None
+    assert store.list_jobs() == {}
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    writer, reader = SQLiteJobStore(path), SQLiteJobStore(path)
+
+    writer.create("a", {"status": "queued", "start_time": 1.0})
+    writer.update("a", status="completed", filename="a.mp3")
+
+    assert reader.get("a")["status"] == "completed"
+    assert reader.get("a")["filename"] == "a.mp3"
+
+
+def test_sqlite_store_creates_its_directory_outside_the_repo(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "state" / "jobs.db"))
+    store.create("a", {"status": "queued", "start_time": 1.0})
+
+    assert (tmp_path / "state" / "jobs.db").exists()
+    assert not JOB_STORE_PATH.startswith(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
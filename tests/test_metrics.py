@@ -0,0 +1,68 @@
+import os
+import json
+import subprocess
+import sys
+
+from metrics import Metrics
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_snapshot(directory, pid, counters=(), histograms=()):
+    with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+        json.dump({"counters": [list(c) for c in counters], "histograms": [list(h) for h in histograms]}, f)
+
+
+def sample(text, line):
+    values = [row.rsplit(" ", 1)[1] for row in text.splitlines() if row.startswith(line + " ")]
+    assert len(values) == 1, line
+    return float(values[0])
+
+
+def test_shared_gauges_are_not_multiplied_by_workers(tmp_path):
+    metrics = Metrics(directory=str(tmp_path))
+    metrics.add_collector(lambda: [("tts_cache_bytes", {}, 1000), ("tts_queue_depth", {}, 2)])
+    metrics.inc("tts_jobs_total", status="completed")
+    # Another live worker sees the same shared cache directory
+    write_snapshot(tmp_path, os.getppid(), counters=[
+        ["tts_cache_bytes", [], 1000],
+        ["tts_queue_depth", [], 3],
+        ["tts_jobs_total", [["status", "completed"]], 4],
+    ])
+
+    text = metrics.render()
+
+    assert sample(text, "tts_cache_bytes") == 1000
+    assert sample(text, "tts_queue_depth") == 5
+    assert sample(text, 'tts_jobs_total{status="completed"}') == 5
+
+
+def test_exited_workers_keep_their_totals(tmp_path):
+    metrics = Metrics(directory=str(tmp_path))
+    pid = dead_pid()
+    write_snapshot(tmp_path, pid, counters=[
+        ["tts_jobs_total", [["status", "completed"]], 7],
+        ["tts_active_jobs", [], 3],
+    ], histograms=[["tts_job_seconds", [], [0] * 16 + [12.5, 7]]])
+
+    first = metrics.render()
+    second = metrics.render()
+
+    assert not os.path.exists(tmp_path / f"{pid}.json")
+    for text in (first, second):
+        assert sample(text, 'tts_jobs_total{status="completed"}') == 7
+        assert sample(text, "tts_job_seconds_count") == 7
+        assert "\ntts_active_jobs " not in text
+
+
+def test_stop_retires_this_process(tmp_path):
+    metrics = Metrics(directory=str(tmp_path))
+    metrics.inc("tts_jobs_total", 2, status="failed")
+    metrics.stop()
+
+    assert not os.path.exists(tmp_path / f"{os.getpid()}.json")
+    assert sample(Metrics(directory=str(tmp_path)).render(), 'tts_jobs_total{status="failed"}') == 2
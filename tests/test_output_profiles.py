@@ -0,0 +1,42 @@
+import pytest
+
+from output_profiles import DEFAULT_PROFILE, accepts_source, cache_params, encoder_args, resolve_profile
+
+
+def test_default_and_named_profiles():
+    assert resolve_profile()["name"] == DEFAULT_PROFILE
+
+    opus = resolve_profile("opus")
+    assert (opus["extension"], opus["mimetype"], opus["sample_rate"]) == ("ogg", "audio/ogg", 24000)
+
+
+def test_overrides():
+    profile = resolve_profile("mp3", channels="2", sample_rate="44100", bitrate="96")
+
+    assert (profile["channels"], profile["sample_rate"], profile["bitrate"]) == (2, 44100, "96k")
+    assert encoder_args(profile) == ["-f", "mp3", "-acodec", "libmp3lame", "-b:a", "96k", "-ac", "2", "-ar", "44100"]
+    assert cache_params(profile) != cache_params(resolve_profile("mp3"))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"name": "flac"},
+    {"channels": 3},
+    {"sample_rate": 12345},
+    {"bitrate": "loud"},
+])
+def test_invalid_requests(kwargs):
+    with pytest.raises(ValueError):
+        resolve_profile(**kwargs)
+
+
+def test_opus_falls_back_to_48k_for_rates_it_cannot_take():
+    assert resolve_profile("opus", sample_rate=44100)["sample_rate"] == 48000
+    assert resolve_profile("opus", sample_rate=16000)["sample_rate"] == 16000
+
+
+def test_source_passthrough():
+    assert accepts_source(resolve_profile("original"))
+    assert accepts_source(resolve_profile("mp3"))
+    assert not accepts_source(resolve_profile("mp3-low"))
+    assert not accepts_source(resolve_profile("mp3", channels=2))
+    assert not accepts_source(resolve_profile("opus"))
@@ -0,0 +1,83 @@
+import asyncio
+
+from resilience import ResilientFetcher
+from tts import ProgressiveWriter
+
+
+def contents(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_writes_chunks_in_order(tmp_path):
+    path = tmp_path / "out.mp3"
+    writer = ProgressiveWriter(str(path), 3)
+
+    writer.feed(1, b"BB")
+    writer.finish(1)
+    assert contents(path) == b""
+
+    writer.feed(0, b"AA")
+    writer.finish(0)
+    assert contents(path) == b"AABB"
+
+    writer.feed(2, b"C")
+    writer.finish(2)
+    writer.close()
+    assert contents(path) == b"AABBC"
+
+
+def test_bytes_reach_the_file_only_after_the_attempt_succeeds(tmp_path):
+    path = tmp_path / "out.mp3"
+    writer = ProgressiveWriter(str(path), 1)
+
+    writer.feed(0, b"partial")
+    # A follower tailing the file must not see audio a retry could replace
+    assert contents(path) == b""
+
+    writer.reset(0)
+    writer.feed(0, b"retried")
+    writer.finish(0)
+    writer.close()
+    assert contents(path) == b"retried"
+
+
+def test_retry_of_a_later_chunk_keeps_earlier_audio(tmp_path):
+    path = tmp_path / "out.mp3"
+    writer = ProgressiveWriter(str(path), 2)
+
+    writer.feed(0, b"first")
+    writer.finish(0)
+    writer.feed(1, b"bad")
+    writer.reset(1)
+    writer.feed(1, b"second")
+    writer.finish(1)
+    writer.close()
+
+    assert contents(path) == b"firstsecond"
+    assert writer.write_seconds >= 0
+
+
+def test_with_fetcher_retry(tmp_path):
+    path = tmp_path / "out.mp3"
+    writer = ProgressiveWriter(str(path), 1)
+    attempts = []
+
+    def open_stream():
+        attempts.append(True)
+
+        async def stream():
+            yield b"xx"
+            if len(attempts) == 1:
+                raise ConnectionError("reset")
+            yield b"yy"
+
+        return stream()
+
+    fetcher = ResilientFetcher(retries=1, backoff_base=0.0, hedge=False)
+    asyncio.run(fetcher.fetch(open_stream, on_data=lambda data: writer.feed(0, data),
+                              on_reset=lambda: writer.reset(0)))
+    writer.finish(0)
+    writer.close()
+
+    assert contents(path) == b"xxyy"
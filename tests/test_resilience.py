@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ResilientFetcher, SynthesisError, SynthesisTimeout
+
+
+def make_fetcher(**kwargs):
+    options = dict(first_byte_timeout=1.0, idle_timeout=1.0, call_timeout=5.0, retries=2,
+                   backoff_base=0.0, hedge=False)
+    options.update(kwargs)
+    return ResilientFetcher(**options)
+
+
+def scripted(*attempts):
+    """open_stream for fetch(): attempt N yields the items of attempts[N]; exceptions are raised"""
+    calls = []
+
+    def open_stream():
+        items = attempts[len(calls)]
+        calls.append(items)
+
+        async def stream():
+            for item in items:
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, float):
+                    await asyncio.sleep(item)
+                    continue
+                yield item
+
+        return stream()
+
+    return open_stream, calls
+
+
+def test_returns_all_audio_and_forwards_chunks():
+    open_stream, _ = scripted([b"ab", b"cd"])
+    received = []
+
+    data = asyncio.run(make_fetcher().fetch(open_stream, on_data=received.append))
+
+    assert data == b"abcd"
+    assert received == [b"ab", b"cd"]
+
+
+def test_events_go_to_on_event_not_into_the_audio():
+    event = {"start": 0.0, "end": 0.2, "text": "Hi"}
+    open_stream, _ = scripted([event, b"ab"])
+    events, received = [], []
+
+    data = asyncio.run(make_fetcher().fetch(open_stream, on_data=received.append, on_event=events.append))
+
+    assert data == b"ab"
+    assert events == [event]
+    assert received == [b"ab"]
+
+
+def test_retry_resets_partial_audio():
+    open_stream, calls = scripted([b"partial", ConnectionError("reset")], [b"full"])
+    received, resets = [], []
+
+    fetcher = make_fetcher()
+    data = asyncio.run(fetcher.fetch(open_stream, on_data=received.append, on_reset=lambda: resets.append(True)))
+
+    assert data == b"full"
+    assert len(calls) == 2
+    assert resets == [True]
+    assert received == [b"partial", b"full"]
+    assert fetcher.stats()["retries"] == 1
+    assert fetcher.stats()["failures"] == 1
+
+
+def test_no_reset_when_failed_attempt_delivered_nothing():
+    open_stream, _ = scripted([ConnectionError("refused")], [b"ok"])
+    resets = []
+
+    asyncio.run(make_fetcher().fetch(open_stream, on_reset=lambda: resets.append(True)))
+
+    assert resets == []
+
+
+def test_gives_up_after_all_retries():
+    open_stream, calls = scripted(*[[ConnectionError("down")]] * 3)
+
+    with pytest.raises(SynthesisError, match="after 3 attempts"):
+        asyncio.run(make_fetcher(retries=2).fetch(open_stream))
+    assert len(calls) == 3
+
+
+def test_permanent_errors_are_not_retried():
+    open_stream, calls = scripted([ValueError("bad voice")], [b"never"])
+    fetcher = make_fetcher()
+
+    with pytest.raises(ValueError):
+        asyncio.run(fetcher.fetch(open_stream))
+    assert len(calls) == 1
+    assert fetcher.breaker.state == "closed"
+
+
+def test_first_byte_timeout():
+    open_stream, _ = scripted([0.5, b"late"])
+    fetcher = make_fetcher(first_byte_timeout=0.05, retries=0)
+
+    with pytest.raises(SynthesisError) as info:
+        asyncio.run(fetcher.fetch(open_stream))
+    assert isinstance(info.value.__cause__, SynthesisTimeout)
+    assert fetcher.stats()["timeouts"] == 1
+
+
+def test_idle_timeout_between_chunks():
+    open_stream, _ = scripted([b"a", 0.5, b"b"], [b"ok"])
+    fetcher = make_fetcher(idle_timeout=0.05, retries=1)
+
+    assert asyncio.run(fetcher.fetch(open_stream)) == b"ok"
+    assert fetcher.stats()["timeouts"] == 1
+
+
+def test_breaker_opens_then_probes():
+    breaker = CircuitBreaker(failures=2, reset=0.05)
+    fetcher = make_fetcher(retries=0, breaker=breaker)
+    open_stream, calls = scripted([ConnectionError("down")], [ConnectionError("down")], [b"back"])
+
+    for _ in range(2):
+        with pytest.raises(SynthesisError):
+            asyncio.run(fetcher.fetch(open_stream))
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(fetcher.fetch(open_stream))
+    assert len(calls) == 2
+    assert fetcher.stats()["rejected"] == 1
+
+    time.sleep(0.06)
+    assert asyncio.run(fetcher.fetch(open_stream)) == b"back"
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failures=1, reset=0.0)
+    breaker.record_failure()
+
+    breaker.before_call()
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_slow_attempt_is_hedged(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY", 0.05)
+    fetcher = make_fetcher(hedge=True, first_byte_timeout=2.0)
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        fetcher.latency.record(0.01)
+    open_stream, calls = scripted([1.0, b"slow"], [b"fast"])
+
+    started = time.perf_counter()
+    data = asyncio.run(fetcher.fetch(open_stream))
+
+    assert data == b"fast"
+    assert len(calls) == 2
+    assert time.perf_counter() - started < 0.9
+    stats = fetcher.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_latency_percentile():
+    tracker = resilience.LatencyTracker(size=10)
+    assert tracker.percentile(0.5) is None
+    for seconds in range(1, 11):
+        tracker.record(seconds / 10)
+    assert tracker.percentile(0.5) == 0.6
+    assert tracker.percentile(1.0) == 1.0
+
+
+def test_cancelled_probe_releases_the_half_open_slot():
+    breaker = CircuitBreaker(failures=1, reset=0.0)
+    breaker.record_failure()
+    fetcher = make_fetcher(retries=0, breaker=breaker)
+    open_stream, calls = scripted([5.0, b"never"], [b"back"])
+
+    async def cancel_probe():
+        probe = asyncio.ensure_future(fetcher.fetch(open_stream))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == "half-open"
+
+    assert asyncio.run(fetcher.fetch(open_stream)) == b"back"
+    assert len(calls) == 2
+    assert breaker.state == "closed"
@@ -0,0 +1,97 @@
+import asyncio
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from ssml_parser import _chunks, iter_fragments, parse_prosody_rate, parse_ssml_to_audio, parse_time_to_ms, plan_requests
+
+
+def plan(ssml, **kwargs):
+    return list(plan_requests(iter_fragments(_chunks(ssml, 7)), **kwargs))
+
+
+def summary(requests):
+    return [(r["kind"], r["text"] if r["kind"] == "text" else r["ms"]) for r in requests]
+
+
+def test_parse_prosody_rate():
+    assert parse_prosody_rate("fast") == 1.2
+    assert parse_prosody_rate("+20%") == 1.2
+    assert parse_prosody_rate("80%") == 0.8
+    assert parse_prosody_rate("1.5") == 1.5
+    assert parse_prosody_rate("bogus") == 1.0
+    assert parse_prosody_rate("-150%") == 1.0
+
+
+def test_parse_time_to_ms():
+    assert parse_time_to_ms("250ms") == 250
+    assert parse_time_to_ms("1.5s") == 1500
+    assert parse_time_to_ms("2") == 0
+
+
+def test_fragments_cover_text_tails_and_nesting():
+    ssml = ('<speak xmlns="http://www.w3.org/2001/10/synthesis">Intro '
+            '<prosody rate="fast">quick <prosody rate="fast">quicker</prosody></prosody> tail</speak>')
+    fragments = list(iter_fragments(_chunks(ssml, 5)))
+
+    assert [(f["text"], round(f["speed"], 2)) for f in fragments] == [
+        ("Intro", 1.0), ("quick", 1.2), ("quicker", 1.44), ("tail", 1.0)
+    ]
+
+
+def test_malformed_break_time_falls_back_to_strength():
+    requests = plan('<speak>A<break time="1.5xs" strength="weak"/>B<break time="oops"/>C</speak>')
+
+    assert summary(requests) == [("text", "A"), ("break", 500), ("text", "B"), ("break", 500), ("text", "C")]
+
+
+@pytest.mark.parametrize("ssml", ["<speak>unclosed", "<voice>Hi</voice>"])
+def test_invalid_documents_raise(ssml):
+    with pytest.raises(ET.ParseError):
+        plan(ssml)
+
+
+def test_renders_with_the_fake_backend():
+    ssml = '<speak>Hello there.<break time="500ms"/><prosody rate="slow">Bye now.</prosody></speak>'
+    timings, words = [], []
+
+    audio = asyncio.run(parse_ssml_to_audio(ssml, "en-US-GuyNeural", concurrency=0, timings=timings, words=words))
+
+    assert audio is not None
+    assert len(audio) > 500
+    assert len(timings) == 2
+    assert [w["text"] for w in words] == ["Hello", "there.", "Bye", "now."]
+    assert words[2]["start"] >= words[1]["end"] + 0.5
+
+
+def test_render_returns_none_for_invalid_ssml():
+    assert asyncio.run(parse_ssml_to_audio("<speak>Hi<p>", "en-US-GuyNeural")) is None
+
+
+def test_merges_runs_with_the_same_speed():
+    requests = plan("<speak>One <emphasis>two</emphasis> three<prosody rate='slow'>slow</prosody>four</speak>")
+
+    assert summary(requests) == [("text", "One two three"), ("text", "slow"), ("text", "four")]
+    assert requests[0]["fragments"] == 3
+    assert requests[0]["tags"] == ["speak", "emphasis"]
+
+
+def test_block_boundaries_keep_a_sentence_break():
+    requests = plan("<speak><p>Title</p><p>Body <s>One!</s><s>Two</s></p>tail</speak>")
+
+    assert summary(requests) == [("text", "Title. Body. One! Two. tail")]
+
+
+def test_breaks_split_runs_and_merge():
+    requests = plan('<speak>A<break time="200ms"/><break strength="strong"/>B<break time="0ms"/>C</speak>')
+
+    assert summary(requests) == [("text", "A"), ("break", 1200), ("text", "B C")]
+
+
+def test_requests_stay_under_max_chars():
+    ssml = "<speak>" + "".join(f"<s>Sentence number {i}.</s>" for i in range(20)) + "</speak>"
+    requests = plan(ssml, max_chars=60)
+
+    assert len(requests) > 1
+    assert all(len(r["text"]) < 60 for r in requests)
+    assert sum(r["fragments"] for r in requests) == 20
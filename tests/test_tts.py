@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import tts
+from tts import FIRST_CHUNK_CHARS, _synthesize_chunks, generate_simple_tts, split_text_into_chunks
+
+
+SCRIPT = " ".join(f"This is sentence number {i} of a script that is long enough to be chunked." for i in range(40))
+
+
+def test_chunks_respect_sentences_paragraphs_and_size():
+    chunks = split_text_into_chunks("One. Two.\n\nThree four five six seven.", max_chars=12)
+
+    assert chunks == ["One. Two.", "Three four", "five six", "seven."]
+
+
+def test_short_first_chunk():
+    chunks = split_text_into_chunks(SCRIPT, max_chars=1500, first_chunk_chars=200)
+    plain = split_text_into_chunks(SCRIPT, max_chars=1500)
+
+    assert 200 <= len(chunks[0]) < 300
+    assert len(plain[0]) > 1000
+    assert " ".join(chunks) == " ".join(plain)
+
+
+def run_job(tmp_path, name, text, **kwargs):
+    script = tmp_path / f"{name}.txt"
+    script.write_text(text, encoding="utf-8")
+    report = {}
+    asyncio.run(generate_simple_tts(str(script), str(tmp_path / f"{name}.mp3"), "en-US-GuyNeural",
+                                    chunked=True, report=report, **kwargs))
+    return report
+
+
+def test_only_progressive_jobs_get_a_short_first_chunk(tmp_path):
+    passthrough = run_job(tmp_path, "passthrough", SCRIPT)
+    transcode = run_job(tmp_path, "transcode", SCRIPT.replace("script", "text"), depth=2)
+
+    assert passthrough["pipeline"] == "passthrough"
+    assert transcode["pipeline"] == "transcode"
+    expected = len(split_text_into_chunks(SCRIPT, first_chunk_chars=FIRST_CHUNK_CHARS))
+    assert len(passthrough["fragment_seconds"]) == expected
+    assert len(transcode["fragment_seconds"]) == len(split_text_into_chunks(SCRIPT.replace("script", "text")))
+
+
+def test_a_failed_chunk_cancels_the_others(monkeypatch):
+    cancelled = []
+
+    async def cached_raw(chunk, *args):
+        if chunk == "bad":
+            await asyncio.sleep(0.01)
+            raise RuntimeError("chunk failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(chunk)
+            raise
+        return b""
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await _synthesize_chunks(["bad", "a", "b", "c"], "en-US-GuyNeural", 1.0, concurrency=4)
+        # Checked before the event loop ends (asyncio.run would cancel leftovers itself)
+        return list(cancelled)
+
+    monkeypatch.setattr(tts, "_cached_raw", cached_raw)
+    assert sorted(asyncio.run(main())) == ["a", "b", "c"]
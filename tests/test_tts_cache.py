@@ -0,0 +1,102 @@
+import os
+import asyncio
+
+from tts_cache import ENTRY_SUFFIX, SynthesisCache, make_cache_key, normalize_text
+
+
+def test_keys_ignore_whitespace_and_param_order():
+    assert normalize_text("  Hello \n  world ") == "Hello world"
+    assert make_cache_key("raw", text="a", speed=1.0) == make_cache_key("raw", speed=1.0, text="a")
+    assert make_cache_key("raw", text="a") != make_cache_key("final", text="a")
+
+
+def test_write_read_and_stats(tmp_path):
+    cache = SynthesisCache(str(tmp_path), max_bytes=1000)
+
+    assert cache.read("k") is None
+    cache.write("k", b"audio")
+    assert cache.read("k") == b"audio"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 5)
+    assert os.listdir(tmp_path) == [f"k{ENTRY_SUFFIX}"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SynthesisCache(str(tmp_path), max_bytes=300)
+    cache.write("a", b"x" * 100)
+    cache.write("b", b"x" * 100)
+    cache.read("a")
+    cache.write("c", b"x" * 100)
+    cache.write("d", b"x" * 100)
+
+    assert cache.read("b") is None
+    assert cache.read("d") is not None
+    assert cache.stats()["bytes"] <= 300
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_quota_holds_for_all_processes_sharing_the_directory(tmp_path):
+    # Two instances stand in for two gunicorn workers
+    first = SynthesisCache(str(tmp_path), max_bytes=3200)
+    second = SynthesisCache(str(tmp_path), max_bytes=3200)
+    for i in range(40):
+        (first if i % 2 else second).write(f"k{i}", b"x" * 100)
+
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    assert on_disk <= 3200 + 2 * first.scan_bytes
+
+
+def test_loads_and_migrates_legacy_mp3_entries(tmp_path):
+    (tmp_path / "old.mp3").write_bytes(b"legacy")
+    (tmp_path / "k.bin.123.456.tmp").write_bytes(b"partial write")
+
+    cache = SynthesisCache(str(tmp_path), max_bytes=1000)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.read("old") == b"legacy"
+    assert (tmp_path / f"old{ENTRY_SUFFIX}").exists()
+    assert not (tmp_path / "old.mp3").exists()
+
+
+def test_get_or_create_copies_the_entry(tmp_path):
+    cache = SynthesisCache(str(tmp_path / "cache"), max_bytes=1000)
+    calls = []
+
+    async def producer(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(b"final")
+
+    first, second = tmp_path / "one.ogg", tmp_path / "two.ogg"
+    asyncio.run(cache.get_or_create("final", str(first), producer))
+    asyncio.run(cache.get_or_create("final", str(second), producer))
+
+    assert len(calls) == 1
+    assert second.read_bytes() == b"final"
+
+
+def test_concurrent_misses_share_one_producer(tmp_path):
+    cache = SynthesisCache(str(tmp_path), max_bytes=1000)
+    calls = []
+
+    async def producer():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        return b"audio"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_create_bytes("k", producer) for _ in range(3)))
+
+    assert asyncio.run(main()) == [b"audio"] * 3
+    assert len(calls) == 1
+    assert cache.stats()["shared"] == 2
+
+
+def test_uncounted_reads_leave_the_hit_rate_alone(tmp_path):
+    cache = SynthesisCache(str(tmp_path), max_bytes=1000)
+    cache.write("words", b"[]")
+
+    assert cache.read("words", count=False) == b"[]"
+    assert cache.read("missing", count=False) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
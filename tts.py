@@ -1,16 +1,363 @@
 import os
+import re
+import json
 import time
+import asyncio
 import tempfile
 import subprocess
-from pydub import AudioSegment
-from pydub.effects import low_pass_filter, speedup
-from ssml_parser import parse_ssml_to_audio
+from dsp import DepthFilter, FadeEnvelope, TimeStretcher
+from ssml_parser import MAX_REQUEST_CHARS, parse_ssml_to_audio
+from cpu_pool import run_cpu
+from metrics import timed
+from pcm_stream import CHANNELS, FRAME_RATE, PCMEncoder, crossfade_blocks, decode_blocks, process_blocks, timed_blocks
+from output_profiles import accepts_source, cache_params, encoder_args, export_segment, resolve_profile
+from synthesis import edge_rate, edge_speed, source_seconds, synthesize_to_bytes
+from backends import get_backend
+from tts_cache import CACHE_ENABLED, get_cache, make_cache_key, normalize_text
+from captions import shift_words, write_captions
 
-async def generate_simple_tts(script_file, output_audio, voice_id, speed=1.0, depth=1, is_ssml=False):
+# Long scripts are split into chunks that are synthesized concurrently
+CHUNKED_ENABLED = os.getenv("TTS_CHUNKED", "1") != "0"
+CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "1500"))
+CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))
+CHUNK_CROSSFADE_MS = int(os.getenv("TTS_CHUNK_CROSSFADE_MS", "0"))
+# A short first chunk gets audio to progressive listeners sooner
+FIRST_CHUNK_CHARS = int(os.getenv("TTS_FIRST_CHUNK_CHARS", "200"))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…。！？])\s+')
+
+
+def _temp_path(temp_dir, prefix, extension="mp3"):
+    # Unique per call: several jobs can finish within the same second
+    return os.path.join(temp_dir, f"{prefix}_{int(time.time())}_{os.urandom(4).hex()}.{extension}")
+
+
+def split_text_into_chunks(text, max_chars=CHUNK_CHARS, first_chunk_chars=None):
+    """
+    Split text at paragraph and sentence boundaries into chunks of at most max_chars.
+
+    Sentences longer than max_chars are split at the last space that fits.
+    If first_chunk_chars is given, the first chunk is closed as soon as it
+    holds that many characters (at a sentence boundary).
+
+    Returns:
+        list: Non-empty text chunks, in order
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        for sentence in _SENTENCE_END.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+        # Paragraph boundary: never merge across it
+        pieces.append(None)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        first_full = not chunks and first_chunk_chars and len(current) >= first_chunk_chars
+        if piece is None or first_full or len(current) + len(piece) + 1 > max_chars:
+            if current:
+                chunks.append(current)
+            current = piece or ""
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _synthesize_raw(content, voice_id, speed, on_data=None, on_reset=None, fragment_seconds=None, words=None):
+    """
+    Run edge-tts for plain text and return the raw MP3 bytes.
+
+    The synthesis time is appended to fragment_seconds if given, and the
+    word timings to words.
+    """
+    rate = edge_rate(speed)
+    if speed != 1.0:
+        print(f"Set edge-tts rate to {rate}")
+    started = time.perf_counter()
+    data = await synthesize_to_bytes(content, voice_id, rate, on_data=on_data, on_reset=on_reset, words=words)
+    if fragment_seconds is not None:
+        fragment_seconds.append(time.perf_counter() - started)
+    return data
+
+
+def _read_words(key, words):
+    """Fill words from the timings cached next to entry key; False if there are none"""
+    # Not counted: the hit rate is about audio, and every audio hit would add a sidecar lookup
+    data = get_cache().read(make_cache_key("words", key=key), count=False)
+    if data is None:
+        return False
+    words[:] = json.loads(data)
+    return True
+
+
+def _write_words(key, words):
+    get_cache().write(make_cache_key("words", key=key), json.dumps(words).encode("utf-8"))
+
+
+async def _cached_raw(content, voice_id, speed, on_data=None, on_reset=None, fragment_seconds=None, words=None):
+    """
+    Like _synthesize_raw, but served from the raw-audio cache when possible.
+
+    on_data receives the audio as it streams in; on a cache hit (or when
+    another job produced it) it receives all of it at once. Word timings
+    are cached next to the audio.
+    """
+    if not CACHE_ENABLED:
+        return await _synthesize_raw(content, voice_id, speed, on_data, on_reset, fragment_seconds, words)
+
+    streamed = False
+
+    async def produce_raw():
+        nonlocal streamed
+        streamed = True
+        data = await _synthesize_raw(content, voice_id, speed, on_data, on_reset, fragment_seconds, words)
+        if words is not None:
+            _write_words(raw_key, words)
+        return data
+
+    raw_key = make_cache_key("raw", text=normalize_text(content), voice_id=voice_id, speed=speed,
+                             backend=get_backend().name)
+    data = await get_cache().get_or_create_bytes(raw_key, produce_raw)
+    if words is not None and not streamed and not _read_words(raw_key, words):
+        # Cached without word timings (e.g. before captions existed): synthesize once more
+        data = await produce_raw()
+    if on_data and not streamed:
+        on_data(data)
+    return data
+
+
+class ProgressiveWriter:
+    """
+    Write chunk audio to a file in playback order while chunks are still arriving.
+
+    Chunk N is written as soon as its synthesis has succeeded and chunks
+    0..N-1 are written, so a reader tailing the file (see /stream-audio)
+    hears the first sentence while the rest is still being synthesized.
+    A chunk's bytes are held back until its attempt succeeds: once bytes
+    reach the file a follower may already have streamed them, so a retried
+    chunk must never have to take them back. write_seconds is the time
+    spent writing to the file.
+    """
+
+    def __init__(self, path, count):
+        self.write_seconds = 0.0
+        self._file = open(path, 'wb')
+        self._buffers = [bytearray() for _ in range(count)]
+        self._done = [False] * count
+        self._next = 0
+
+    def feed(self, index, data):
+        self._buffers[index].extend(data)
+
+    def finish(self, index):
+        self._done[index] = True
+        self._flush()
+
+    def reset(self, index):
+        """Drop partial audio of a chunk that is about to be retried"""
+        self._buffers[index] = bytearray()
+
+    def _flush(self):
+        while self._next < len(self._buffers) and self._done[self._next]:
+            started = time.perf_counter()
+            self._file.write(self._buffers[self._next])
+            self._file.flush()
+            self.write_seconds += time.perf_counter() - started
+            self._buffers[self._next] = None
+            self._next += 1
+
+    def close(self):
+        self._file.close()
+
+
+async def _synthesize_chunks(chunks, voice_id, speed, concurrency=CHUNK_CONCURRENCY, writer=None, progress=None,
+                             fragment_seconds=None, words=None, overlap=0.0):
+    """
+    Synthesize text chunks concurrently.
+
+    Each chunk is retried on its own (see resilience.py), so one dropped
+    connection does not fail a long narration. If a ProgressiveWriter is
+    given, audio is handed to it as it arrives and dropped when a chunk
+    is retried; it reaches the file once the chunk has succeeded. If a
+    chunk fails for good, the chunks still running are cancelled.
+    progress(done, total) is called after each finished chunk. The
+    synthesis time of each chunk that was not cached is appended to
+    fragment_seconds if given. If words is given it receives the word
+    timings of all chunks on the timeline of the joined audio, where each
+    chunk starts `overlap` seconds (the crossfade) before the previous one ends.
+
+    Returns:
+        list: Raw MP3 bytes per chunk, in the same order as chunks
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    chunk_words = [[] if words is not None else None for _ in chunks]
+    done = 0
+
+    async def synthesize_chunk(index, chunk):
+        nonlocal done
+        async with semaphore:
+            on_data = (lambda data: writer.feed(index, data)) if writer else None
+            on_reset = (lambda: writer.reset(index)) if writer else None
+            raw = await _cached_raw(chunk, voice_id, speed, on_data, on_reset, fragment_seconds, chunk_words[index])
+            if writer:
+                writer.finish(index)
+            done += 1
+            if progress:
+                progress(done, len(chunks))
+            return raw
+
+    if len(chunks) > 1:
+        print(f"Synthesizing {len(chunks)} chunks, concurrency={concurrency}")
+    tasks = [asyncio.ensure_future(synthesize_chunk(i, c)) for i, c in enumerate(chunks)]
+    try:
+        raw_chunks = await asyncio.gather(*tasks)
+    except BaseException:
+        # One chunk failed (or the job was cancelled): stop the others instead of
+        # letting them hold backend slots and breaker budget for a failed job
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    if words is not None:
+        offset = 0.0
+        for raw, spoken in zip(raw_chunks, chunk_words):
+            words.extend(shift_words(spoken, offset=offset))
+            offset += source_seconds(raw) - overlap
+    return raw_chunks
+
+
+def _stretch_factor(speed):
+    """
+    Tempo change applied after synthesis: the part of speed edge-tts cannot
+    produce, times the extra 0.85/1.15 factor for speeds outside 0.8-1.2.
+    """
+    factor = speed / edge_speed(speed)
+    if speed < 0.8:
+        factor *= 0.85
+    elif speed > 1.2:
+        factor *= 1.15
+    return factor
+
+
+def _needs_speedup(speed):
+    return abs(_stretch_factor(speed) - 1.0) >= 1e-3
+
+
+def needs_transcode(speed, depth):
+    """True if the edge-tts output has to be decoded for post-processing"""
+    return _needs_speedup(speed) or depth > 1
+
+
+def is_progressive(speed, depth, is_ssml=False, profile=None):
+    """True if the job output file is written progressively while synthesizing"""
+    profile = profile or resolve_profile()
+    return not is_ssml and not needs_transcode(speed, depth) and accepts_source(profile)
+
+
+def _transcode(raw_chunks, final_path, speed, depth, profile, crossfade_ms=CHUNK_CROSSFADE_MS):
+    """
+    CPU stage of the transcode pipeline (runs in cpu_pool).
+
+    PCM is streamed from the ffmpeg decoder through the speed and depth
+    processors into the ffmpeg encoder in fixed-size blocks, so memory use
+    stays flat however long the audio is.
+
+    Returns:
+        dict: Seconds spent in the decode, speedup, depth and encode stages
+    """
+    timings = {}
+    if crossfade_ms and len(raw_chunks) > 1:
+        blocks = crossfade_blocks([decode_blocks([raw]) for raw in raw_chunks], FRAME_RATE, crossfade_ms)
+    else:
+        # edge-tts emits headerless MP3 frames, so chunks can be decoded as one stream
+        blocks = decode_blocks(raw_chunks)
+    blocks = timed_blocks(blocks, timings, "decode")
+
+    stages = []
+    # 🎚️ Extra speedup/slowdown for dramatic effect
+    if _needs_speedup(speed):
+        factor = _stretch_factor(speed)
+        stages.append(("speedup", TimeStretcher(FRAME_RATE, CHANNELS, factor)))
+        print(f"Applied secondary speed factor: {factor:.3g}")
+
+    # 🎚️ Depth filter (low-pass, bass boost and fades, see dsp.py)
+    if depth > 1:
+        print(f"Applying depth {depth}: low-pass at {18000 - depth * 3000}Hz, bass +{(depth - 1) * 3}dB")
+        stages += [("depth", DepthFilter(FRAME_RATE, depth)), ("depth", FadeEnvelope(FRAME_RATE))]
+
+    with timed(timings, "encode"):
+        encoder = PCMEncoder(final_path, FRAME_RATE, CHANNELS, encoder_args(profile))
+    try:
+        for block in process_blocks(blocks, stages, timings):
+            with timed(timings, "encode"):
+                encoder.write(block)
+    except BaseException:
+        encoder.abort()
+        raise
+    with timed(timings, "encode"):
+        encoder.close()
+    return timings
+
+
+async def _cached_final(key, final_path, produce, words=None):
+    """
+    get_cache().get_or_create() for a final file, with its word timings
+    cached next to it. produce(path) must fill words on a miss.
+    """
+    cache = get_cache()
+    if words is None:
+        return await cache.get_or_create(key, final_path, produce)
+
+    produced = False
+
+    async def produce_with_words(path):
+        nonlocal produced
+        produced = True
+        await produce(path)
+        _write_words(key, words)
+
+    await cache.get_or_create(key, final_path, produce_with_words)
+    if not produced and not _read_words(key, words):
+        # Cached without word timings (e.g. before captions existed): render once more
+        await produce_with_words(final_path)
+    return final_path
+
+
+async def generate_simple_tts(script_file, output_audio, voice_id, speed=1.0, depth=1, is_ssml=False,
+                              chunked=CHUNKED_ENABLED, report=None, progress=None, profile=None, captions=False):
     """
     Generate TTS audio from a script file.
     Supports SSML processing and audio effects.
-    
+
+    Both the raw edge-tts output and the final post-processed file are kept
+    in a content-addressed cache (see tts_cache.py), so repeated scripts
+    skip synthesis entirely. edge-tts audio is streamed into memory and
+    decoded from a buffer, without temporary files. Plain text longer than
+    TTS_CHUNK_CHARS is split at sentence boundaries and synthesized
+    concurrently when chunked is True. When no speed or depth effect is
+    needed, the edge-tts MP3 is written to output_audio as-is (no ffmpeg),
+    progressively and in order, so it can be streamed while in progress.
+    Decoding, effects and encoding run in the CPU process pool
+    (cpu_pool.py), off the event loop that does the network I/O, and
+    stream PCM block by block (pcm_stream.py) in constant memory.
+    report["timings"] gets the seconds spent per stage (synthesis, decode,
+    speedup, depth, encode, write) and report["fragment_seconds"] the
+    synthesis time of each fragment. With captions=True, word timings are
+    taken from the same synthesis requests, moved to the output's timeline
+    (chunk and fragment offsets, crossfades, tempo changes) and written as
+    SRT and WebVTT next to the returned file (see captions.py);
+    report["captions"] gets their paths.
+
     Args:
         script_file (str): Path to the text or SSML script file
         output_audio (str): Output .mp3 file path
@@ -18,78 +365,128 @@ async def generate_simple_tts(script_file, output_audio, voice_id, speed=1.0, de
         speed (float): Playback speed factor
         depth (int): Depth effect level (1 = none)
         is_ssml (bool): If True, treat input as SSML
+        chunked (bool): Split long plain text into concurrently synthesized chunks
+        report (dict): Optional dict that receives details about the run, e.g.
+            report["pipeline"] is "passthrough", "transcode" or "ssml"
+        progress (callable): Optional progress(done, total) callback, called as
+            chunks or SSML fragments finish
+        profile (dict): Output format from output_profiles.resolve_profile()
+            (default: TTS_OUTPUT_PROFILE). Jobs encoded by ffmpeg record
+            report["encode_seconds"].
+        captions (bool): Also write .srt and .vtt captions
 
     Returns:
         str: Path to the generated audio file
+
+    Raises:
+        SynthesisError: edge-tts could not produce the audio (see resilience.py);
+            the job fails instead of completing with placeholder audio
     """
     print(f"Generating voice with {voice_id}, speed={speed}, depth={depth}, SSML={is_ssml}")
+    if report is None:
+        report = {}
+    profile = profile or resolve_profile()
+    report["output_profile"] = profile["name"]
+    timings = report.setdefault("timings", {})
+    fragment_seconds = report.setdefault("fragment_seconds", [])
 
     with open(script_file, 'r', encoding='utf-8') as f:
         content = f.read()
 
     temp_dir = os.path.join(tempfile.gettempdir(), "tts_generator")
     os.makedirs(temp_dir, exist_ok=True)
+    words = [] if captions else None
+
+    def finish(path):
+        if words:
+            report["captions"] = write_captions(words, path)
+        return path
 
     try:
         if is_ssml:
             # 🧠 Custom SSML parsing + synthesis with edge-tts
-            audio = await parse_ssml_to_audio(content, voice_id)
-            if audio:
-                final_path = os.path.join(temp_dir, f"ssml_final_{int(time.time())}.mp3")
-                audio.export(final_path, format="mp3", bitrate="192k")
-                return final_path
-            else:
-                raise Exception("SSML parsing failed or returned no audio")
+            async def produce_ssml(final_path):
+                fragments = []
+                with timed(timings, "synthesis"):
+                    audio = await parse_ssml_to_audio(content, voice_id, timings=fragments, progress=progress,
+                                                      words=words)
+                for fragment in fragments:
+                    fragment_seconds.append(fragment["synthesis_seconds"])
+                    for stage in ("decode", "speedup"):
+                        if f"{stage}_seconds" in fragment:
+                            timings[stage] = timings.get(stage, 0.0) + fragment[f"{stage}_seconds"]
+                if not audio:
+                    raise Exception("SSML parsing failed or returned no audio")
+                started = time.perf_counter()
+                with timed(timings, "encode"):
+                    await run_cpu(export_segment, audio, final_path, profile)
+                report["encode_seconds"] = round(time.perf_counter() - started, 3)
 
-        # ✅ Standard text TTS using edge-tts Python API
-        from edge_tts import Communicate
-        base_audio_path = os.path.join(temp_dir, f"base_{int(time.time())}.mp3")
-        communicate = Communicate(content.strip(), voice_id)
-
-        if speed != 1.0:
-            rate_pct = int((1.0 / speed) * 100)
-            communicate.rate = f"{rate_pct}%"
-            print(f"Set edge-tts rate to {rate_pct}%")
-
-        await communicate.save(base_audio_path)
+            report["pipeline"] = "ssml"
+            final_path = _temp_path(temp_dir, "ssml_final", profile["extension"])
+            if not CACHE_ENABLED:
+                await produce_ssml(final_path)
+                return finish(final_path)
 
-        if not os.path.exists(base_audio_path) or os.path.getsize(base_audio_path) == 0:
-            raise Exception("Audio file generation failed")
+            final_key = make_cache_key("final", text=content.strip(), voice_id=voice_id, is_ssml=True,
+                                       backend=get_backend().name, max_request_chars=MAX_REQUEST_CHARS,
+                                       **cache_params(profile))
+            return finish(await _cached_final(final_key, final_path, produce_ssml, words))
 
-        audio = AudioSegment.from_file(base_audio_path)
+        # ✅ Standard text TTS using edge-tts Python API
+        progressive = is_progressive(speed, depth, profile=profile)
+        # The short first chunk only pays off where listeners hear audio while it is written
+        first_chunk_chars = FIRST_CHUNK_CHARS if progressive else None
+        chunks = split_text_into_chunks(content, first_chunk_chars=first_chunk_chars) if chunked else []
+        if len(chunks) <= 1:
+            chunks = [content]
 
-        # 🎚️ Extra speedup/slowdown for dramatic effect
-        if speed < 0.8 or speed > 1.2:
-            factor = 0.85 if speed < 0.8 else 1.15
-            audio = speedup(audio, playback_speed=factor)
-            print(f"Applied secondary speed factor: {factor}")
+        async def synthesize(writer=None, words=None, overlap=0.0):
+            with timed(timings, "synthesis"):
+                return await _synthesize_chunks(chunks, voice_id, speed, writer=writer, progress=progress,
+                                                fragment_seconds=fragment_seconds, words=words, overlap=overlap)
 
-        # 🎚️ Depth filter
-        if depth > 1:
-            cutoff = 18000 - (depth * 3000)
-            print(f"Applying low-pass filter at {cutoff}Hz")
-            audio = low_pass_filter(audio, cutoff)
+        if progressive:
+            # ⚡ Pass-through: edge-tts bytes go straight to the job output as
+            # they arrive, no ffmpeg. Chunk crossfades only apply when transcoding.
+            report["pipeline"] = "passthrough"
+            writer = ProgressiveWriter(output_audio, len(chunks))
+            try:
+                await synthesize(writer, words)
+            finally:
+                writer.close()
+                timings["write"] = writer.write_seconds
+            return finish(output_audio)
 
-            bass_boost_db = (depth - 1) * 3
-            if bass_boost_db > 0:
-                print(f"Boosting bass +{bass_boost_db}dB")
-                bass = audio.low_pass_filter(300) + bass_boost_db
-                audio = audio.overlay(bass)
+        async def produce_final(final_path):
+            # I/O stage on this event loop, CPU stage in the process pool
+            raw_words = [] if words is not None else None
+            overlap = CHUNK_CROSSFADE_MS / 1000 if len(chunks) > 1 else 0.0
+            raw_chunks = await synthesize(words=raw_words, overlap=overlap)
+            started = time.perf_counter()
+            timings.update(await run_cpu(_transcode, raw_chunks, final_path, speed, depth, profile))
+            report["encode_seconds"] = round(time.perf_counter() - started, 3)
+            if words is not None:
+                factor = _stretch_factor(speed) if _needs_speedup(speed) else 1.0
+                words.extend(shift_words(raw_words, factor=factor))
 
-            fade = min(200, len(audio) // 20)
-            audio = audio.fade_in(fade).fade_out(fade)
+        report["pipeline"] = "transcode"
+        final_path = _temp_path(temp_dir, "final", profile["extension"])
+        if not CACHE_ENABLED:
+            await produce_final(final_path)
+            return finish(final_path)
 
-        final_path = os.path.join(temp_dir, f"final_{int(time.time())}.mp3")
-        audio.export(final_path, format="mp3", bitrate="192k")
-        return final_path
+        # Chunk boundaries and the crossfade between chunks change the joined audio
+        final_key = make_cache_key(
+            "final", text=normalize_text(content), voice_id=voice_id,
+            speed=speed, depth=depth, is_ssml=False, backend=get_backend().name,
+            chunked=bool(chunked), chunk_chars=CHUNK_CHARS, crossfade_ms=CHUNK_CROSSFADE_MS,
+            **cache_params(profile)
+        )
+        return finish(await _cached_final(final_key, final_path, produce_final, words))
 
     except ImportError:
         print("Installing edge-tts...")
         subprocess.call(["pip", "install", "edge-tts"])
-        return await generate_simple_tts(script_file, output_audio, voice_id, speed, depth, is_ssml)
-
-    except Exception as e:
-        print(f"TTS generation error: {e}")
-        fallback_path = os.path.join(temp_dir, f"silent_{int(time.time())}.mp3")
-        AudioSegment.silent(duration=3000).export(fallback_path, format="mp3")
-        return fallback_path
+        return await generate_simple_tts(script_file, output_audio, voice_id, speed, depth, is_ssml, chunked, report, progress,
+                                         profile, captions)
@@ -0,0 +1,305 @@
+import os
+import json
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+# Cache settings (override with environment variables)
+CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") != "0"
+CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tts_generator", "cache"))
+CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # for all workers together
+
+ENTRY_SUFFIX = ".bin"
+LEGACY_SUFFIX = ".mp3"
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different scripts share a cache entry"""
+    return " ".join(text.split())
+
+
+def make_cache_key(kind, **params):
+    """
+    Build a content-addressed key for a cache entry.
+
+    Args:
+        kind (str): Entry type, e.g. "raw" (edge-tts output) or "final" (post-processed)
+        **params: Everything that influences the audio (text, voice_id, speed, ...)
+
+    Returns:
+        str: Hex sha256 digest
+    """
+    payload = json.dumps({"kind": kind, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """
+    Size-bounded, least-recently-used cache of audio files on disk.
+
+    Entries are plain files named after their key, so several processes
+    (e.g. gunicorn workers) can share the same directory. Identical
+    requests that are in flight at the same time share one producer.
+
+    The directory is the shared index: before evicting, and after every
+    scan_bytes written, it is re-scanned so entries written by other
+    workers count against the one quota. Between scans each worker can add
+    at most scan_bytes, so the directory stays within max_bytes plus that
+    much per worker.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.scan_bytes = max(1, max_bytes // 32)
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total_bytes = 0
+        self._unscanned_bytes = 0  # written by this process since the last scan
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _path(self, key):
+        # Entries hold MP3, Ogg/Opus or JSON alike, so the name carries no format
+        return os.path.join(self.cache_dir, f"{key}{ENTRY_SUFFIX}")
+
+    def _load(self):
+        # Rebuild the LRU order from file modification times (hits touch them in every worker)
+        found = []
+        for name in os.listdir(self.cache_dir):
+            key, suffix = os.path.splitext(name)
+            if suffix not in (ENTRY_SUFFIX, LEGACY_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if suffix == LEGACY_SUFFIX:
+                    # Written before entries used a neutral suffix
+                    os.replace(path, self._path(key))
+                    path = self._path(key)
+                stat = os.stat(path)
+            except OSError:
+                continue  # evicted or migrated by another worker meanwhile
+            found.append((stat.st_mtime, key, stat.st_size))
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._unscanned_bytes = 0
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _evict_locked(self):
+        if self._total_bytes <= self.max_bytes and self._unscanned_bytes < self.scan_bytes:
+            return
+        self._load()
+        # Evict one scan interval below the quota so a full cache is not re-scanned on every write
+        while self._total_bytes > self.max_bytes - self.scan_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def fetch(self, key, dest_path):
+        """
+        Copy a cached entry to dest_path.
+
+        Returns:
+            bool: True on a cache hit
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, dest_path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+            return False
+
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                # Written by another worker process
+                self._entries[key] = os.path.getsize(dest_path)
+                self._total_bytes += self._entries[key]
+        os.utime(path)
+        return True
+
+    def put(self, key, src_path):
+        """Store a copy of src_path under key and evict old entries if over quota"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._unscanned_bytes += size
+            self._evict_locked()
+
+    def read(self, key, count=True):
+        """
+        Return the cached bytes for key, or None on a miss.
+
+        With count=False the lookup is left out of the hit/miss statistics
+        (used for sidecar entries such as word timings).
+        """
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                if count:
+                    self.misses += 1
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+            return None
+
+        with self._lock:
+            if count:
+                self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._entries[key] = len(data)
+                self._total_bytes += len(data)
+        os.utime(self._path(key))
+        return data
+
+    def write(self, key, data):
+        """Store data under key and evict old entries if over quota"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._unscanned_bytes += len(data)
+            self._evict_locked()
+
+    async def _single_flight(self, key, produce):
+        # Run produce() once per key; concurrent callers await the same result
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+
+        if not owner:
+            # Another job is already producing this audio - wait for it
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await produce()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_create(self, key, dest_path, producer):
+        """
+        Return dest_path filled from the cache, or from producer on a miss.
+
+        Args:
+            key (str): Cache key from make_cache_key
+            dest_path (str): Where the caller wants the audio file
+            producer (callable): Async function taking dest_path and writing the audio there
+
+        Returns:
+            str: dest_path
+        """
+        if self.fetch(key, dest_path):
+            return dest_path
+
+        async def produce():
+            await producer(dest_path)
+            self.put(key, dest_path)
+            return dest_path
+
+        source_path = await self._single_flight(key, produce)
+        if source_path != dest_path:
+            shutil.copyfile(source_path, dest_path)
+        return dest_path
+
+    async def get_or_create_bytes(self, key, producer):
+        """
+        Return the cached bytes for key, or the result of producer on a miss.
+
+        Args:
+            key (str): Cache key from make_cache_key
+            producer (callable): Async function returning the audio bytes
+
+        Returns:
+            bytes: The audio data
+        """
+        data = self.read(key)
+        if data is not None:
+            return data
+
+        async def produce():
+            data = await producer()
+            self.write(key, data)
+            return data
+
+        return await self._single_flight(key, produce)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return this process's cache, creating it on first use (entries on disk are shared)"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = SynthesisCache()
+            _cache_pid = os.getpid()
+        return _cache